@@ -1,8 +1,6 @@
 import time
 import os
-import subprocess
 import sys
-import fcntl # Specific to Linux/WSL for non-blocking IO
 from datetime import datetime
 import streamlit as st
 import streamlit.components.v1 as components
@@ -31,6 +29,11 @@ WORKSPACE_ROOT = SCRIPT_LOCATION
 TESTS_DIR = os.path.join(WORKSPACE_ROOT, "tests")
 RESULTS_DIR = os.path.join(WORKSPACE_ROOT, "results")
 PROJECT_INDEX_FILE = os.path.join(WORKSPACE_ROOT, "project.md")
+# Where results/ is served over HTTP (e.g. the backend's /results mount); empty = no embed
+REPORTS_URL = os.getenv("REPORTS_URL", "")
+FAILURES_PAGE_SIZE = 20
+# Warm robot processes shared by all sessions (see backend/worker_pool.py)
+RUNNER_WORKERS = int(os.getenv("RUNNER_WORKERS", 2))
 
 os.makedirs(TESTS_DIR, exist_ok=True)
 os.makedirs(RESULTS_DIR, exist_ok=True)
@@ -41,23 +44,36 @@ try:
     load_dotenv()
     from langchain_openai import ChatOpenAI
     from langchain_core.messages import HumanMessage, SystemMessage
+    from frontend.stream_parser import ActionStreamParser
+    from backend.context_window import SUMMARY_CACHE_PATH, SUMMARY_CACHE_TTL, ContextWindow
+    from backend.llm_cache import ResponseCache
+    from backend.project_index import ProjectIndex
+    from backend.results_store import ResultsStore
+    from backend.worker_pool import ProcessRun, WorkerPool
 except Exception as e:
     st.error(f"Startup Error: {e}")
     st.stop()
 
 # --- 4. ENGINE FUNCTIONS ---
 
+@st.cache_resource
+def get_project_index():
+    """One index per server process; it survives reruns and only re-parses changed files."""
+    return ProjectIndex(TESTS_DIR, PROJECT_INDEX_FILE)
+
+@st.cache_resource
+def get_results_store():
+    return ResultsStore(RESULTS_DIR)
+
+@st.cache_resource
+def get_worker_pool():
+    """Robot is imported once per worker, not once per run."""
+    return WorkerPool(WORKSPACE_ROOT, RUNNER_WORKERS).start()
+
 def scan_project():
-    if not os.path.exists(TESTS_DIR): return []
-    files = [f for f in os.listdir(TESTS_DIR) if f.endswith(".robot")]
-    
-    index_content = f"# Project Index\n\n**Location:** `{TESTS_DIR}`\n\n## Files:\n"
-    for f in files:
-        index_content += f"- **{f}**\n"
-    
-    with open(PROJECT_INDEX_FILE, "w") as f:
-        f.write(index_content)
-    return files
+    index = get_project_index()
+    index.refresh() # Writes project.md only when something changed
+    return index.files()
 
 def write_file_and_verify(filename, content):
     full_path = os.path.join(TESTS_DIR, filename)
@@ -81,45 +97,38 @@ def read_file(filename):
 if "active_process" not in st.session_state:
     st.session_state.active_process = None
     st.session_state.live_logs = "" # Stores the accumulating logs
-    st.session_state.last_report_path = None
-
-def set_non_blocking(file):
-    """Makes a file object non-blocking (Linux/WSL only)."""
-    fd = file.fileno()
-    flags = fcntl.fcntl(fd, fcntl.F_GETFL)
-    fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+    st.session_state.last_run = None
 
 def start_test_background(filename):
     test_path = os.path.join(TESTS_DIR, filename)
     if not os.path.exists(test_path):
         return f"Error: {filename} not found."
 
+    # Every run gets its own directory, older results stay browsable
+    run_id = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    run_dir = os.path.join(RESULTS_DIR, run_id)
+
     # Removed "--console dotted" so we see actual text
     cmd = [
         "robot", 
-        "--outputdir", RESULTS_DIR, 
+        "--outputdir", run_dir, 
         test_path
     ]
     
     try:
-        # Start process with pipes
-        proc = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT, # Merge stderr into stdout
-            text=True,
-            cwd=WORKSPACE_ROOT,
-            bufsize=1, # Line buffered
-            start_new_session=True 
-        )
-        
-        # KEY: Make output non-blocking so we can read "whatever is there" without hanging
-        set_non_blocking(proc.stdout)
+        # Runs on a warm pool worker; the console output is buffered until read
+        pool = get_worker_pool()
+        if pool.free():
+            proc = pool.run(cmd[0], cmd[1:])
+        else:
+            # Every worker is busy (or still warming up): don't queue behind them
+            proc = ProcessRun(cmd, WORKSPACE_ROOT)
         
         st.session_state.active_process = proc
         st.session_state.active_test_name = filename
+        st.session_state.active_run = {"id": run_id, "dir": run_dir, "ingested": False}
         st.session_state.live_logs = f"🚀 Starting {filename}...\n"
-        st.session_state.last_report_path = None
+        st.session_state.last_run = None
         
         ui_log(f"Started: {' '.join(cmd)}")
         return f"🚀 Started {filename}..."
@@ -148,7 +157,7 @@ with st.sidebar:
         # 1. READ NEW LOGS (Non-Blocking)
         try:
             # Read everything currently in the buffer
-            new_data = proc.stdout.read()
+            new_data = proc.read()
             if new_data:
                 st.session_state.live_logs += new_data
         except Exception:
@@ -177,15 +186,27 @@ with st.sidebar:
         else:
             # --- FINISHED ---
             status = "✅ PASS" if ret_code == 0 else "❌ FAIL"
+            st.session_state.live_logs += proc.read() # Lines that arrived after the read above
             st.write(f"**Result:** {status}")
             
             # Show final complete logs
             st.text_area("Final Output", st.session_state.live_logs, height=300)
             
+            # Record the run once in the history store
+            run = st.session_state.active_run
+            output_file = os.path.join(run["dir"], "output.xml")
+            if not run["ingested"] and os.path.exists(output_file):
+                try:
+                    summary = get_results_store().ingest(run["id"], output_file, st.session_state.active_test_name)
+                    ui_log(f"Recorded run {run['id']}: {summary['passed']} passed, {summary['failed']} failed")
+                except Exception as e:
+                    ui_log(f"History error: {e}")
+                run["ingested"] = True
+
             # Check for report
-            report_file = os.path.join(RESULTS_DIR, "report.html")
+            report_file = os.path.join(run["dir"], "report.html")
             if os.path.exists(report_file):
-                st.session_state.last_report_path = report_file
+                st.session_state.last_run = run
                 if "Report Generated" not in st.session_state.live_logs:
                      st.success("Report Ready!")
             
@@ -194,17 +215,37 @@ with st.sidebar:
                 st.rerun()
 
 # --- 7. REPORT VIEWER ---
-if st.session_state.last_report_path:
+# The report itself is never read into this process: a paginated failure
+# summary comes from the run history, the full report is embedded by URL.
+if st.session_state.last_run:
+    run = st.session_state.last_run
+    summary = get_results_store().run(run["id"])
     st.divider()
     st.subheader("📊 Test Report")
-    with open(st.session_state.last_report_path, "r", encoding="utf-8") as f:
-        report_html = f.read()
-    
-    st.download_button("📥 Download HTML", report_html, "report.html", "text/html")
-    components.html(report_html, height=600, scrolling=True)
+    st.caption(f"📁 `{os.path.join(run['dir'], 'report.html')}`")
+    if summary:
+        st.write(f"✅ {summary['passed']} passed · ❌ {summary['failed']} failed · ⏭️ {summary['skipped']} skipped")
+        if summary["failed"]:
+            pages = (summary["failed"] - 1) // FAILURES_PAGE_SIZE + 1
+            page = st.number_input("Failures page", 1, pages, 1) if pages > 1 else 1
+            failures = get_results_store().tests(
+                run["id"], "FAIL", FAILURES_PAGE_SIZE, (page - 1) * FAILURES_PAGE_SIZE
+            )
+            for test in failures:
+                with st.expander(f"❌ {test['full_name']} ({test['elapsed'] or 0:.2f}s)"):
+                    st.code(test["message"] or "(no message)", language="text")
+    if REPORTS_URL:
+        report_url = f"{REPORTS_URL.rstrip('/')}/{run['id']}/report.html"
+        st.link_button("📄 Open Report", report_url)
+        components.iframe(report_url, height=600, scrolling=True)
     st.divider()
 
 # --- 8. CHAT ---
+@st.cache_resource
+def get_summary_cache():
+    """Conversation summaries, shared across reruns and sessions."""
+    return ResponseCache(SUMMARY_CACHE_PATH, SUMMARY_CACHE_TTL)
+
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
@@ -217,57 +258,65 @@ if prompt := st.chat_input("Ex: Run hello_world.robot"):
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    # Context Loading
-    project_index_content = ""
-    if os.path.exists(PROJECT_INDEX_FILE):
-         with open(PROJECT_INDEX_FILE, "r") as f: project_index_content = f.read()
+    # Context Loading: only the part of the index relevant to this prompt
+    project_index_content = get_project_index().context_for(prompt)
 
     try:
         llm = ChatOpenAI(model="gpt-4o", temperature=0)
         
+        # Only the newest turns that fit the token budget are sent, older ones as a summary
+        recent, summary, usage = ContextWindow(llm, get_summary_cache()).fit(st.session_state.messages)
+        summary_block = f"CONVERSATION SUMMARY: {summary}" if summary else ""
+        
         system_prompt = f"""
         You are a QA Architect.
         WORKSPACE ROOT: {WORKSPACE_ROOT}
         PROJECT CONTEXT: {project_index_content}
-        
+        {summary_block}
         TOOLS:
         1. WRITE: Output a ```robot code block. Put "File: <name>" on the line before.
         2. RUN: "ACTION: RUN <filename>"
         3. READ: "ACTION: READ <filename>"
         """
         
+        msgs = [SystemMessage(content=system_prompt)] + \
+               [HumanMessage(content=m["content"]) for m in recent]
+        ui_log(f"Prompt: {usage['history_tokens']} history tokens, "
+               f"{usage['turns_sent']} turns sent, {usage['turns_summarized']} summarized")
+        
+        # Actions fire as soon as their block/line is complete in the stream
+        parser = ActionStreamParser()
+        results = []
+        started_runs = []
+
+        def handle(action):
+            if action[0] == "write":
+                _, filename, code = action
+                if "hello" in prompt.lower(): filename = "hello_world.robot"
+                results.append((st.success, write_file_and_verify(filename, code)))
+            elif action[0] == "run":
+                results.append((st.info, start_test_background(action[1])))
+                started_runs.append(action[1])
+            elif action[0] == "read":
+                results.append((st.text, read_file(action[1])))
+
+        def tokens():
+            for chunk in llm.stream(msgs):
+                for action in parser.feed(chunk.content):
+                    handle(action)
+                yield chunk.content
+            for action in parser.close():
+                handle(action)
+
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                msgs = [SystemMessage(content=system_prompt)] + \
-                       [HumanMessage(content=m["content"]) for m in st.session_state.messages]
-                
-                response = llm.invoke(msgs)
-                content = response.content
-                
-                if "```robot" in content:
-                    code = content.split("```robot")[1].split("```")[0].strip()
-                    filename = "generated.robot"
-                    for line in content.split('\n'):
-                        if "File:" in line: 
-                            parts = line.split("File:")[1].strip().split()
-                            if parts: filename = parts[0]
-                    if "hello" in prompt.lower(): filename = "hello_world.robot"
-                    res = write_file_and_verify(filename, code)
-                    st.success(res)
-
-                if "ACTION: RUN" in content:
-                    f = content.split("ACTION: RUN")[1].strip()
-                    res = start_test_background(f)
-                    st.info(res)
-                    # Trigger the refresh loop
-                    st.rerun() 
-                
-                if "ACTION: READ" in content:
-                    f = content.split("ACTION: READ")[1].strip()
-                    st.text(read_file(f))
-
-                st.markdown(content)
-                st.session_state.messages.append({"role": "assistant", "content": content})
+            content = st.write_stream(tokens())
+            for show, res in results:
+                show(res)
+        st.session_state.messages.append({"role": "assistant", "content": content})
+
+        if started_runs:
+            # Trigger the refresh loop
+            st.rerun()
 
     except Exception as e:
         st.error(f"Error: {e}")
\ No newline at end of file
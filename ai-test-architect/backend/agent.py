@@ -2,22 +2,42 @@ from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, SystemMessage
 from dotenv import load_dotenv
 import os
+import time
+from . import metrics
+from .llm_cache import ResponseCache, cache_key
+from .context_window import SUMMARY_CACHE_PATH, SUMMARY_CACHE_TTL, ContextWindow, count_tokens
 
 load_dotenv()
 
+# --- CONFIG ---
+MODEL = os.getenv("OPENAI_MODEL", "gpt-4o")
+# "fake" swaps in an offline stand-in that answers with FAKE_LLM_RESPONSE
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+
+def create_llm():
+    if LLM_PROVIDER == "fake":
+        from langchain_core.language_models.fake_chat_models import FakeListChatModel
+        return FakeListChatModel(responses=[os.getenv("FAKE_LLM_RESPONSE", "ACTION: RUN hello_world.robot")])
+    return ChatOpenAI(model=MODEL, temperature=0)
+
 try:
-    llm = ChatOpenAI(model="gpt-4o", temperature=0)
-except:
+    llm = create_llm()
+except Exception:
     llm = None
 
-def ask_agent(messages, context):
-    if not llm:
-        return "Error: OpenAI Key missing."
-    
+response_cache = ResponseCache()
+context_window = ContextWindow(llm, ResponseCache(SUMMARY_CACHE_PATH, SUMMARY_CACHE_TTL))
+
+def _prepare(messages, context):
+    """Builds the LangChain messages, the cache key and the token usage for a chat turn."""
+    # Only user turns are sent; assistant turns would eat budget they never use
+    sent = [m for m in messages if m['role'] == 'user']
+    recent, summary, usage = context_window.fit(sent)
+    summary_block = f"\n    CONVERSATION SUMMARY: {summary}\n" if summary else ""
     system_prompt = f"""
     You are a QA Architect.
     PROJECT CONTEXT: {context}
-    
+    {summary_block}
     TOOLS:
     1. WRITE: Output a ```robot code block. Put "File: <name>" on the line before.
     2. RUN: "ACTION: RUN <filename>"
@@ -25,12 +45,70 @@ def ask_agent(messages, context):
     
     # Convert incoming dicts to LangChain objects
     lc_messages = [SystemMessage(content=system_prompt)]
-    for m in messages:
-        if m['role'] == 'user':
-            lc_messages.append(HumanMessage(content=m['content']))
-        elif m['role'] == 'assistant':
-            # Skip system messages to prevent confusion
-            pass
-            
-    response = llm.invoke(lc_messages)
-    return response.content
\ No newline at end of file
+    history = [m['content'] for m in recent]
+    lc_messages.extend(HumanMessage(content=h) for h in history)
+    
+    usage["system_tokens"] = count_tokens(system_prompt)
+    usage["prompt_tokens"] = usage["system_tokens"] + usage["history_tokens"]
+    for part in ("system", "history", "summary"):
+        metrics.PROMPT_TOKENS.observe(usage[f"{part}_tokens"], part=part)
+    return lc_messages, cache_key(f"{LLM_PROVIDER}:{MODEL}", system_prompt, history), usage
+
+def ask_agent(messages, context):
+    """Returns (content, usage)."""
+    if not llm:
+        return "Error: OpenAI Key missing.", {}
+    
+    lc_messages, key, usage = _prepare(messages, context)
+    called = []
+
+    def compute():
+        called.append(True)
+        return llm.invoke(lc_messages).content
+
+    start = time.perf_counter()
+    content = response_cache.get_or_compute(key, MODEL, compute)
+    metrics.LLM_REQUEST.observe(time.perf_counter() - start, kind="chat", cache="miss" if called else "hit")
+    return content, usage
+
+def stream_agent(messages, context):
+    """
+    Returns (usage, tokens): `tokens` yields the completion chunk by chunk,
+    cache hits are yielded in one piece.
+    """
+    if not llm:
+        return {}, iter(["Error: OpenAI Key missing."])
+    
+    lc_messages, key, usage = _prepare(messages, context)
+
+    def tokens():
+        start = time.perf_counter()
+        cached = pending = None
+        if response_cache.enabled:
+            cached, pending = response_cache.claim(key)
+            if pending is not None:
+                # An identical request is streaming right now: replay its text
+                cached = pending.result()
+        if cached is not None:
+            metrics.LLM_REQUEST.observe(time.perf_counter() - start, kind="stream", cache="hit")
+            yield cached
+            return
+        
+        chunks = []
+        try:
+            for chunk in llm.stream(lc_messages):
+                if not chunks:
+                    metrics.LLM_FIRST_TOKEN.observe(time.perf_counter() - start)
+                chunks.append(chunk.content)
+                yield chunk.content
+        except BaseException as e:
+            # Also a client that disconnected (GeneratorExit): don't leave followers waiting
+            if response_cache.enabled:
+                error = e if isinstance(e, Exception) else RuntimeError("stream closed before the end")
+                response_cache.release(key, error=error)
+            raise
+        metrics.LLM_REQUEST.observe(time.perf_counter() - start, kind="stream", cache="miss")
+        if response_cache.enabled:
+            response_cache.release(key, MODEL, "".join(chunks))
+
+    return usage, tokens()
@@ -0,0 +1,102 @@
+import hashlib
+import os
+from functools import lru_cache
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from . import metrics
+from .llm_cache import LLM_CACHE_PATH
+
+# --- CONFIG ---
+# Tokens of chat history sent verbatim; older turns are folded into a summary.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 6000))
+SUMMARY_MAX_WORDS = int(os.getenv("SUMMARY_MAX_WORDS", 200))
+# Summaries live in their own store, so they stay cached with LLM_CACHE_TTL=0
+SUMMARY_CACHE_PATH = os.getenv(
+    "SUMMARY_CACHE_PATH", os.path.join(os.path.dirname(LLM_CACHE_PATH), "summaries.sqlite")
+)
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", 7 * 24 * 3600))  # seconds
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _encoding = None
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text):
+    """Token count with tiktoken when installed, else a ~4 chars/token estimate."""
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+class ContextWindow:
+    """
+    Token-budgeted sliding window over the chat history.
+
+    The newest turns that fit into `budget` are sent as-is. Everything older
+    is replaced by a summary, built incrementally: the summary of the longest
+    already-summarized prefix is extended with the turns after it, and every
+    summary is cached by a hash of the prefix it covers.
+    """
+
+    def __init__(self, llm, cache, budget=CONTEXT_TOKEN_BUDGET):
+        self.llm = llm
+        self.cache = cache
+        self.budget = budget
+
+    def fit(self, messages):
+        """
+        Returns (recent_messages, summary, usage) for one request. Pass only
+        the turns the request sends, so the budget and usage count them alone.
+        """
+        kept, used = 0, 0
+        for m in reversed(messages):
+            cost = count_tokens(m["content"])
+            # The latest turn is always sent, even when it alone exceeds the budget
+            if kept and used + cost > self.budget:
+                break
+            kept, used = kept + 1, used + cost
+
+        split = len(messages) - kept
+        summary = self._summarize(messages[:split]) if split else ""
+        usage = {
+            "history_tokens": used,
+            "summary_tokens": count_tokens(summary) if summary else 0,
+            "turns_sent": kept,
+            "turns_summarized": split,
+        }
+        return messages[split:], summary, usage
+
+    def _summarize(self, older):
+        # Rolling hash per prefix length: digests[i] identifies older[:i + 1]
+        digests, digest = [], b""
+        for m in older:
+            digest = hashlib.sha256(digest + f"{m['role']}\0{m['content']}\0".encode("utf-8")).digest()
+            digests.append(f"summary:{digest.hex()}")
+
+        # Resume from the longest prefix that already has a summary
+        start, summary = 0, ""
+        for i in range(len(older), 0, -1):
+            cached = self.cache.get(digests[i - 1]) if self.cache.enabled else None
+            if cached is not None:
+                start, summary = i, cached
+                break
+        if start == len(older):
+            return summary
+
+        turns = "\n".join(f"{m['role'].upper()}: {m['content']}" for m in older[start:])
+        prompt = [
+            SystemMessage(content=(
+                "Summarize this QA chat for a test-automation assistant. Keep file names, "
+                f"decisions and open requests. At most {SUMMARY_MAX_WORDS} words."
+            )),
+            HumanMessage(content=f"PREVIOUS SUMMARY:\n{summary or '(none)'}\n\nNEW TURNS:\n{turns}"),
+        ]
+        with metrics.LLM_REQUEST.time(kind="summary", cache="miss"):
+            summary = self.llm.invoke(prompt).content
+        if self.cache.enabled:
+            self.cache.put(digests[-1], "summary", summary)
+        return summary
@@ -0,0 +1,307 @@
+import hashlib
+import json
+import os
+import re
+
+import yaml
+from jinja2 import Environment, meta
+from robot.api import get_model
+from robot.api.parsing import ModelVisitor
+from robot.utils import Importer
+
+# Shared with the custom libraries, which Robot imports by path
+_cache = Importer("cache helper").import_class_or_module_by_path(os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources", "keywords", "custom-libs", "_cache.py"
+))
+
+# Robot variable syntax, e.g. ${version}
+_VARIABLE = re.compile(r"\$\{([^}]+)\}")
+
+
+def _normalize(name):
+    """Robot matches variable and keyword names case-, space- and underscore-insensitively."""
+    return name.lower().replace(" ", "").replace("_", "")
+
+
+def _digest(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    elif not isinstance(data, bytes):
+        data = json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+class _RobotFile(ModelVisitor):
+    """Per-test blocks and the dependencies declared in one .robot/.resource file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.imports = []  # resolved resource/library/variable file paths
+        self.variables = {}  # normalized name -> scalar value
+        self.tests = {}  # test name -> (first line, last line)
+        self.registry_calls = {None: []}  # test name (None = whole file) -> [args]
+        self._test = None
+
+    def parse(self):
+        self.visit(get_model(self.path))
+        return self
+
+    def visit_TestCase(self, node):
+        self.tests[node.name] = (node.lineno, node.end_lineno)
+        self.registry_calls[node.name] = []
+        self._test = node.name
+        self.generic_visit(node)
+        self._test = None
+
+    def visit_Keyword(self, node):
+        # Calls inside user keywords may run from any test of the file
+        self.generic_visit(node)
+
+    def visit_Variable(self, node):
+        if node.name and node.name.startswith("${") and len(node.value) == 1:
+            self.variables[_normalize(node.name[2:-1])] = node.value[0]
+
+    def _import(self, node):
+        if not node.name:
+            return
+        path = os.path.normpath(os.path.join(os.path.dirname(self.path), node.name))
+        if os.path.isfile(path):
+            self.imports.append(path)
+
+    visit_ResourceImport = visit_LibraryImport = visit_VariablesImport = _import
+
+    def _call(self, name, args):
+        if name and _normalize(name.split(".")[-1]) == "loadregistry" and len(args) >= 3:
+            self.registry_calls[self._test].append(tuple(args[:3]))
+
+    def visit_KeywordCall(self, node):
+        self._call(node.keyword, node.args)
+
+    def _fixture(self, node):
+        self._call(node.name, node.args)
+
+    visit_Setup = visit_Teardown = visit_SuiteSetup = visit_SuiteTeardown = _fixture
+    visit_TestSetup = visit_TestTeardown = _fixture
+
+
+class TestImpact:
+    """
+    Test-impact analysis for `run affected` mode.
+
+    Builds a dependency graph from every (DataLoader-expanded) test of a
+    suite to the units it depends on, each with a content hash:
+      robot:<file>#<test>         the test's own block
+      robot:<file>                the rest of the suite file (settings, variables, keywords)
+      file:<path>                 imported resources/libraries (transitively), DataLoader
+      yaml:<file>#<test>          the test's YAML key without its scenarios
+      yaml:<file>#<test>/<iter>   one scenario
+      registry:<p>/<c>/<v>        registries loaded via `Load Registry`
+      template:<name>             templates those registries reference (plus includes)
+
+    A test's fingerprint is the hash of all its units. After a run, the
+    fingerprints of passed tests are stored; a test is affected when its
+    fingerprint differs from the stored one (new, changed or not passed yet).
+    """
+
+    def __init__(self, base_dir, env_name="UAT", state_file=None):
+        self.base_dir = base_dir
+        self.env_name = env_name
+        self.testcases_dir = os.path.join(base_dir, "testcases")
+        self.testdata_dir = os.path.join(base_dir, "resources", "config", "testdata", env_name)
+        self.registry_dir = os.path.join(base_dir, "resources", "registry")
+        self.template_dir = os.path.join(base_dir, "resources", "templates")
+        self.data_loader = os.path.join(base_dir, "resources", "keywords", "custom-libs", "DataLoader.py")
+        self.state_file = state_file or os.path.join(base_dir, ".cache", "impact", f"{env_name}.json")
+        self._hashes = {}  # path -> ((mtime_ns, size), digest)
+        self._jinja = Environment()
+        self._resolved = {}
+
+    # --- PUBLIC API ---
+
+    def graph(self, path):
+        """Returns {test name: {unit: hash}} for every test the suite expands to."""
+        self._resolved = {}  # registry call args -> units, scenarios mostly share them
+        suite = _RobotFile(path).parse()
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+
+        in_tests = set()
+        for first, last in suite.tests.values():
+            in_tests.update(range(first, last + 1))
+        common = {f"robot:{self._rel(path)}": _digest("".join(
+            line for number, line in enumerate(lines, 1) if number not in in_tests
+        ))}
+        for dep in self._file_deps(path, suite.imports) + [self.data_loader]:
+            if os.path.isfile(dep):
+                common[f"file:{self._rel(dep)}"] = self._file_hash(dep)
+
+        resources = [_RobotFile(p).parse() for p in suite.imports if p.endswith((".robot", ".resource"))]
+        shared_calls = suite.registry_calls[None] + [c for r in resources for c in r.registry_calls[None]]
+        variables = {**{k: v for r in resources for k, v in r.variables.items()}, **suite.variables}
+
+        data = self._load_data(path)
+        yaml_rel = self._rel(self._yaml_path(path))
+        graph = {}
+        for name, (first, last) in suite.tests.items():
+            units = {**common, f"robot:{self._rel(path)}#{name}": _digest("".join(lines[first - 1:last]))}
+            calls = shared_calls + suite.registry_calls[name]
+            config = data.get(name)
+            if not isinstance(config, dict):
+                units.update(self._registry_units(calls, variables))
+                graph[name] = units
+                continue
+
+            scenarios = config.get("TestScenarios", []) or []
+            units[f"yaml:{yaml_rel}#{name}"] = _digest({k: v for k, v in config.items() if k != "TestScenarios"})
+            # Same naming as DataLoader._expand_test_case
+            for index, scenario in enumerate(scenarios):
+                iter_name = (scenario.get("RunSettings") or {}).get("IterationName", f"iter_{index + 1}")
+                scenario_vars = {_normalize(k): v for k, v in (scenario.get("ScenarioVars") or {}).items()}
+                graph[f"{name} - {iter_name}"] = {
+                    **units,
+                    f"yaml:{yaml_rel}#{name}/{iter_name}": _digest(scenario),
+                    **self._registry_units(calls, {**variables, **scenario_vars}),
+                }
+        return graph
+
+    def affected(self, path, graph=None):
+        """
+        Returns (affected test names, {name: changed units}) compared to the
+        stored baseline. A test without a baseline lists no units.
+        """
+        graph = graph if graph is not None else self.graph(path)
+        baseline = self._load_state().get(self._rel(path), {})
+        reasons = {}
+        for name, units in graph.items():
+            previous = baseline.get(name)
+            if previous is None:
+                reasons[name] = []
+            elif previous["fingerprint"] != _digest(units):
+                reasons[name] = sorted(
+                    unit for unit, digest in units.items() if previous["units"].get(unit) != digest
+                ) + sorted(unit for unit in previous["units"] if unit not in units)
+        return [name for name in graph if name in reasons], reasons
+
+    def record(self, path, passed, graph):
+        """Stores `graph` (as computed before the run) as baseline for the passed tests."""
+        state = self._load_state()
+        suite = state.setdefault(self._rel(path), {})
+        for name in passed:
+            if name in graph:
+                suite[name] = {"fingerprint": _digest(graph[name]), "units": graph[name]}
+        for name in list(suite):
+            if name not in graph:
+                del suite[name]
+        self._save_state(state)
+
+    # --- GRAPH ---
+
+    def _rel(self, path):
+        return os.path.relpath(path, self.base_dir)
+
+    def _yaml_path(self, path):
+        # DataLoader layout: testcases/<rel>.robot -> resources/config/testdata/<env>/<rel>.yaml
+        rel_path = os.path.relpath(os.path.abspath(path), self.testcases_dir)
+        return os.path.normpath(os.path.join(self.testdata_dir, os.path.splitext(rel_path)[0] + ".yaml"))
+
+    def _load_data(self, path):
+        try:
+            with open(self._yaml_path(path), "r") as f:
+                return yaml.safe_load(f) or {}
+        except FileNotFoundError:
+            return {}
+
+    def _file_deps(self, path, imports, seen=None):
+        """Imported files, following resource files' own imports."""
+        seen = seen if seen is not None else {path}
+        found = []
+        for dep in imports:
+            if dep in seen:
+                continue
+            seen.add(dep)
+            found.append(dep)
+            if dep.endswith((".robot", ".resource")):
+                found += self._file_deps(dep, _RobotFile(dep).parse().imports, seen)
+        return found
+
+    def _file_hash(self, path):
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = self._hashes.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        with open(path, "rb") as f:
+            digest = _digest(f.read())
+        self._hashes[path] = (stamp, digest)
+        return digest
+
+    def _registry_units(self, calls, variables):
+        units = {}
+        for call in calls:
+            args = tuple(
+                _VARIABLE.sub(lambda m: str(variables.get(_normalize(m.group(1)), m.group(0))), a) for a in call
+            )
+            if args not in self._resolved:
+                self._resolved[args] = self._resolve_registry(args)
+            units.update(self._resolved[args])
+        return units
+
+    def _resolve_registry(self, args):
+        if any("${" in a for a in args):
+            # Unresolvable product/component/version: depend on every candidate registry
+            pattern = [a if "${" not in a else None for a in args]
+            paths = [p for p in self._registries() if all(
+                want is None or want == got for want, got in zip(pattern, p[:-len(".yaml")].split(os.sep)[-3:])
+            )]
+        else:
+            paths = [os.path.join(self.registry_dir, args[0], args[1], f"{args[2]}.yaml")]
+        units = {}
+        for path in paths:
+            if not os.path.isfile(path):
+                continue
+            units[f"registry:{os.path.relpath(path, self.registry_dir)}"] = self._file_hash(path)
+            for template in self._registry_templates(path):
+                self._template_units(template, units)
+        return units
+
+    def _registries(self):
+        for root, _, files in os.walk(self.registry_dir):
+            for name in files:
+                if name.endswith(".yaml"):
+                    yield os.path.join(root, name)
+
+    def _registry_templates(self, path):
+        with open(path, "r") as f:
+            registry = yaml.safe_load(f) or {}
+        templates = [cmd.get("template") for cmd in (registry.get("commands") or {}).values() if cmd]
+        templates += list((registry.get("components") or {}).values())
+        return [t for t in templates if isinstance(t, str)]
+
+    def _template_units(self, name, units=None):
+        """The template and everything it includes, imports or extends."""
+        units = {} if units is None else units
+        path = os.path.join(self.template_dir, name)
+        if f"template:{name}" in units or not os.path.isfile(path):
+            return units
+        units[f"template:{name}"] = self._file_hash(path)
+        with open(path, "r", encoding="utf-8") as f:
+            try:
+                referenced = meta.find_referenced_templates(self._jinja.parse(f.read()))
+            except Exception:
+                referenced = []
+        for ref in referenced:
+            if ref:
+                self._template_units(ref, units)
+        return units
+
+    # --- STATE ---
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state):
+        _cache.write_atomic(self.state_file, json.dumps(state).encode("utf-8"))
@@ -0,0 +1,464 @@
+import asyncio
+import os
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from robot.api import TestSuiteBuilder
+from robot.utils import Importer
+
+from .impact import TestImpact
+from . import metrics
+from .logbuffer import LogBuffer
+from .run_queue import RunQueue
+from .sharding import plan, write_argfile
+from .worker_pool import PoolError, WorkerPool
+
+# --- CONFIG ---
+# Max number of concurrent `robot` worker processes across all jobs.
+WORKERS = int(os.getenv("RUNNER_WORKERS", os.cpu_count() or 1))
+# Environment passed to the DataLoader pre-run modifier.
+TEST_ENV = os.getenv("TEST_ENV", "UAT")
+# Longest single console line accepted from a worker.
+STREAM_LIMIT = 2**20
+# Run robot/rebot on warm pre-imported worker processes instead of the CLI.
+USE_POOL = os.getenv("RUNNER_POOL", "1") != "0"
+# Jobs running at once in total / per user; the rest wait in the run queue.
+MAX_JOBS = int(os.getenv("RUNNER_MAX_JOBS", 2))
+MAX_JOBS_PER_USER = int(os.getenv("RUNNER_MAX_JOBS_PER_USER", 1))
+# Owner of runs submitted without a user.
+DEFAULT_USER = "anonymous"
+
+
+def collect_tests(path, data_loader, env_name, names=None):
+    """
+    Returns full names of the tests as the workers will see them (after
+    DataLoader expansion), optionally only those named in `names`.
+    """
+    suite = TestSuiteBuilder().build(path)
+    if os.path.exists(data_loader):
+        loader = Importer("model modifier").import_class_or_module_by_path(
+            data_loader, instantiate_with_args=(env_name,)
+        )
+        suite.visit(loader)
+    return [test.full_name for test in suite.all_tests if names is None or test.name in names]
+
+
+class Job:
+    """One `/run` request. Owns its ID, output directory, logs and status."""
+
+    def __init__(self, filename, path, output_dir, affected_only=False, user=DEFAULT_USER, priority=0,
+                 job_id=None, created=None):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.filename = filename
+        self.path = path
+        self.affected_only = affected_only
+        self.user = user
+        self.priority = priority
+        self.impact = None  # dependency graph at job start, see TestImpact.graph
+        self.output_dir = os.path.join(output_dir, self.id)
+        self.status = "queued"  # queued, running, finished, aborted
+        self.result = None  # PASS, FAIL, ABORTED
+        self.shards = 0
+        self.predicted_makespan = None  # seconds, from the shard plan
+        self.actual_makespan = None  # seconds, wall time of the slowest shard
+        self.created = created or datetime.now().isoformat(timespec="seconds")
+        self.buffer = LogBuffer()
+        self.task = None
+
+    def log(self, line):
+        self.buffer.append(line)
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "file": self.filename,
+            "status": self.status,
+            "result": self.result,
+            "shards": self.shards,
+            "mode": "affected" if self.affected_only else "full",
+            "user": self.user,
+            "priority": self.priority,
+            "predicted_makespan": self.predicted_makespan,
+            "actual_makespan": self.actual_makespan,
+            "created": self.created,
+            "output_dir": self.output_dir,
+            "cursor": self.buffer.end,
+            "report_url": self._artifact_url("report.html"),
+            "log_url": self._artifact_url("log.html"),
+        }
+
+    def _artifact_url(self, name):
+        if os.path.exists(os.path.join(self.output_dir, name)):
+            return f"/results/{self.id}/{name}"
+        return None
+
+
+class JobScheduler:
+    """
+    Runs each job as N parallel `robot` workers.
+    The (DataLoader-expanded) tests of a suite are packed into shards by
+    their recorded durations (see sharding.plan), every shard writes its own
+    output.xml and `rebot --merge` folds them back into a single suite tree.
+    Workers are warm pool processes once start_pool() ran (see worker_pool),
+    otherwise `robot`/`rebot` CLI processes.
+
+    Jobs wait in a persistent RunQueue and start by priority while fewer
+    than `max_jobs` run in total and fewer than `max_jobs_per_user` for
+    their user.
+    """
+
+    def __init__(self, base_dir, results_dir, workers=WORKERS, env_name=TEST_ENV, store=None,
+                 max_jobs=MAX_JOBS, max_jobs_per_user=MAX_JOBS_PER_USER):
+        self.base_dir = base_dir
+        self.results_dir = results_dir
+        self.workers = max(1, workers)
+        self.libs_dir = os.path.join(base_dir, "resources", "keywords", "custom-libs")
+        self.data_loader = os.path.join(self.libs_dir, "DataLoader.py")
+        self.env_name = env_name
+        self.store = store
+        self.impact = TestImpact(base_dir, env_name)
+        self.pool = None
+        self.queue = RunQueue(results_dir)
+        self.max_jobs = max(1, max_jobs)
+        self.max_jobs_per_user = max(1, max_jobs_per_user)
+        self.jobs = {}
+        self._running = Counter()  # user -> jobs started and not yet ended
+        self._slots = asyncio.Semaphore(self.workers)
+        self._closing = False
+
+    # --- PUBLIC API ---
+
+    def submit(self, filename, path, affected_only=False, user=DEFAULT_USER, priority=0):
+        """
+        Queues the job and returns immediately; it starts on the running
+        event loop as soon as the concurrency caps allow. Raises QueueFull
+        when the queue is full. With `affected_only`, only tests whose
+        dependencies changed since their last passing run are executed.
+        """
+        job = Job(filename, path, self.results_dir, affected_only, user, priority)
+        self.queue.push(job)
+        self.jobs[job.id] = job
+        job.log(f"🕒 Queued {filename} (priority {priority})\n")
+        self._dispatch()
+        return job
+
+    def resume(self):
+        """Re-queues the jobs a previous backend process left unfinished. Call on the event loop."""
+        for row in self.queue.recover():
+            job = Job(
+                row["filename"], row["path"], self.results_dir, bool(row["affected_only"]),
+                row["user"], row["priority"], job_id=row["job_id"], created=row["created"],
+            )
+            self.jobs[job.id] = job
+            job.log(f"♻️ Re-queued {job.filename} after a backend restart\n")
+        self._dispatch()
+
+    def abort(self, job):
+        """Cancels the job; its worker processes are terminated by the cancellation."""
+        if job.status == "queued" and job.task is None:
+            self.queue.remove(job.id)
+            job.status = "aborted"
+            job.result = "ABORTED"
+            job.log(f"\n[Process Finished: {job.result}]")
+            job.buffer.close()
+            return True
+        if job.task and not job.task.done():
+            job.task.cancel()
+            return True
+        return False
+
+    def queued(self):
+        """Waiting jobs in the order they will start."""
+        return [self.jobs[row["job_id"]] for row in self.queue.pending() if row["job_id"] in self.jobs]
+
+    def warm_registry_index(self):
+        """
+        Builds ContextBuilder's registry index once, so parallel workers
+        attach to the pickled index instead of each re-parsing the YAML.
+        """
+        path = os.path.join(self.libs_dir, "ContextBuilder.py")
+        try:
+            # Robot's importer puts custom-libs on sys.path for the library's own imports
+            module = Importer("library").import_module(path)
+            module.RegistryIndex(self.base_dir).load()
+        except Exception as e:
+            print(f"⚠️ Registry index not built: {e}")
+
+    def start_pool(self):
+        """Starts one warm worker per slot; without it every run starts a `robot` process."""
+        if USE_POOL and self.pool is None:
+            self.pool = WorkerPool(self.base_dir, self.workers).start()
+
+    async def close(self):
+        """
+        Stops running jobs and the worker pool on shutdown. Their queue rows
+        stay, so resume() starts them again in the next backend process.
+        """
+        self._closing = True
+        tasks = [job.task for job in self.jobs.values() if job.task and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self.pool is not None:
+            await asyncio.to_thread(self.pool.close)
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def latest(self):
+        return next(reversed(self.jobs.values()), None)
+
+    # --- EXECUTION ---
+
+    def _dispatch(self):
+        """Starts queued jobs, by priority, while the concurrency caps allow."""
+        if self._closing:
+            return
+        for row in self.queue.pending():
+            if sum(self._running.values()) >= self.max_jobs:
+                return
+            job = self.jobs.get(row["job_id"])
+            if job is None or self._running[job.user] >= self.max_jobs_per_user:
+                continue
+            self.queue.mark_running(job.id)
+            self._running[job.user] += 1
+            job.status = "running"
+            job.log(f"🚀 Starting {job.filename}...\n")
+            job.task = asyncio.create_task(self._run_job(job))
+            job.task.add_done_callback(lambda _, job=job: self._finish(job))
+
+    def _modifier_args(self):
+        if not os.path.exists(self.data_loader):
+            return []
+        return ["--prerunmodifier", f"{self.data_loader}:{self.env_name}"]
+
+    def _collect_tests(self, path, names=None):
+        return collect_tests(path, self.data_loader, self.env_name, names)
+
+    def _plan(self, tests):
+        durations = self.store.durations(tests) if self.store is not None else {}
+        shards, loads = plan(tests, durations, self.workers)
+        return shards, loads, sum(t in durations for t in tests)
+
+    async def _run_job(self, job):
+        start = time.monotonic()
+        try:
+            ret = await self._execute(job)
+            job.result = "PASS" if ret == 0 else "FAIL"
+            job.status = "finished"
+        except asyncio.CancelledError:
+            job.result = "ABORTED"
+            job.status = "aborted"
+        except Exception as e:
+            job.log(f"❌ Runner error: {e}\n")
+            job.result = "FAIL"
+            job.status = "finished"
+        metrics.JOB.observe(time.monotonic() - start, result=job.result)
+        if job.status == "finished":
+            await self._ingest(job)
+            await self._record_impact(job)
+
+    def _finish(self, job):
+        """
+        Done callback of the job's task. Also runs when the task was cancelled
+        before its first step (abort right after dispatch, close()).
+        """
+        if job.result is None:
+            job.status, job.result = "aborted", "ABORTED"
+        if not job.buffer.closed:
+            job.log(f"\n[Process Finished: {job.result}]")
+            job.buffer.close()
+        self._running[job.user] -= 1
+        if not self._closing:
+            self.queue.remove(job.id)
+            self._dispatch()
+
+    async def _ingest(self, job):
+        """Parses the job's output.xml into the run history store."""
+        output = os.path.join(job.output_dir, "output.xml")
+        if self.store is None or not os.path.exists(output):
+            return
+        try:
+            await asyncio.to_thread(self.store.ingest, job.id, output, job.filename, job.created)
+        except Exception as e:
+            job.log(f"⚠️ Could not record run history: {e}\n")
+
+    async def _record_impact(self, job):
+        """Stores the job's graph as the impact baseline of every test that passed."""
+        if self.store is None or job.impact is None or not self.store.run(job.id):
+            return
+        try:
+            passed = [t["name"] for t in self.store.tests(job.id, "PASS", limit=-1)]
+            await asyncio.to_thread(self.impact.record, job.path, passed, job.impact)
+        except Exception as e:
+            job.log(f"⚠️ Could not record impact baseline: {e}\n")
+
+    async def _select_affected(self, job):
+        """Returns the names of the affected tests, or None to run everything."""
+        try:
+            job.impact = await asyncio.to_thread(self.impact.graph, job.path)
+        except Exception as e:
+            job.log(f"⚠️ Impact analysis failed, running all tests: {e}\n")
+            return None
+        if not job.affected_only:
+            return None
+        affected, reasons = self.impact.affected(job.path, job.impact)
+        job.log(f"🎯 {len(affected)} of {len(job.impact)} tests affected\n")
+        for name in affected:
+            why = ", ".join(reasons[name]) or "no passing baseline"
+            job.log(f"   • {name}: {why}\n")
+        return set(affected)
+
+    async def _execute(self, job):
+        selected = await self._select_affected(job)
+        if selected is not None and not selected:
+            job.log("✅ Nothing to run\n")
+            return 0
+
+        try:
+            # Parsing the suite is blocking work, keep it off the event loop
+            tests = await asyncio.to_thread(self._collect_tests, job.path, selected)
+        except Exception as e:
+            job.log(f"❌ Could not parse {job.filename}: {e}\n")
+            tests = []
+        else:
+            if selected and not tests:
+                # Renamed since the impact state was recorded, or names built from variables
+                job.log(f"⚠️ None of the {len(selected)} affected tests matched a test of "
+                        f"{job.filename}: {', '.join(sorted(selected))}; running all tests instead\n")
+                selected = None
+
+        # A selection always needs explicit --test filters, even for a single test
+        if len(tests) > 1 or (selected and tests):
+            shards, loads, known = await asyncio.to_thread(self._plan, tests)
+        else:
+            shards, loads, known = [], [], 0
+        job.shards = max(1, len(shards))
+        os.makedirs(job.output_dir, exist_ok=True)
+
+        if not shards:
+            cmd = ["robot", *self._modifier_args(), "--outputdir", job.output_dir, job.path]
+            return await self._run_worker(job, cmd, prefix="", output_dir=job.output_dir)
+
+        job.predicted_makespan = round(max(loads), 3)
+        job.log(
+            f"⚙️ Splitting {len(tests)} tests across {len(shards)} workers "
+            f"(history for {known}, predicted makespan {job.predicted_makespan:.1f}s)\n"
+        )
+        outputs = []
+        workers = []
+        start = time.monotonic()
+        for index, shard in enumerate(shards):
+            shard_dir = os.path.join(job.output_dir, f"shard_{index + 1}")
+            os.makedirs(shard_dir, exist_ok=True)
+            arg_file = os.path.join(shard_dir, "tests.args")
+            write_argfile(arg_file, shard)
+            cmd = [
+                "robot", *self._modifier_args(),
+                "--argumentfile", arg_file,
+                "--outputdir", shard_dir,
+                "--log", "NONE", "--report", "NONE",
+                job.path,
+            ]
+            outputs.append(os.path.join(shard_dir, "output.xml"))
+            worker = self._run_worker(job, cmd, prefix=f"[shard {index + 1}] ", output_dir=shard_dir)
+            workers.append(self._timed(worker, start))
+
+        results = await asyncio.gather(*workers)
+        codes = [code for code, _ in results]
+        for index, (_, elapsed) in enumerate(results):
+            job.log(f"⏱️ Shard {index + 1}: predicted {loads[index]:.1f}s, actual {elapsed:.1f}s\n")
+        job.actual_makespan = round(max(elapsed for _, elapsed in results), 3)
+        job.log(f"⏱️ Makespan: predicted {job.predicted_makespan:.1f}s, actual {job.actual_makespan:.1f}s\n")
+        await self._merge(job, [o for o in outputs if os.path.exists(o)])
+        return 0 if all(code == 0 for code in codes) else 1
+
+    async def _timed(self, worker, start):
+        """Return code and seconds from `start` until the worker finished."""
+        code = await worker
+        return code, time.monotonic() - start
+
+    async def _run_worker(self, job, cmd, prefix, output_dir):
+        # The custom libraries append their timings here, see custom-libs/_metrics.py
+        metrics_file = os.path.join(output_dir, "metrics.jsonl")
+        async with self._slots:
+            try:
+                with metrics.WORKER.time(kind="robot"):
+                    env = {"ROBOT_METRICS_FILE": metrics_file}
+                    return await self._run(cmd, env, lambda line: job.log(prefix + line))
+            finally:
+                metrics.load_library_metrics(metrics_file)
+
+    async def _merge(self, job, outputs):
+        if not outputs:
+            job.log("❌ No shard produced an output.xml\n")
+            return
+        cmd = [
+            "rebot",
+            "--outputdir", job.output_dir,
+            "--output", "output.xml",
+            "--merge",
+            *outputs,
+        ]
+        job.log(f"🧩 Merging {len(outputs)} shard outputs\n")
+        with metrics.WORKER.time(kind="rebot"):
+            await self._run(cmd, {})
+
+    async def _run(self, cmd, env, output=None):
+        """
+        Runs a `robot`/`rebot` command line on a pool worker, or as a CLI
+        process without a pool. Console lines go to output(line), if given.
+        """
+        if self.pool is not None:
+            try:
+                return await self._run_pooled(cmd, env, output)
+            except PoolError as e:
+                print(f"⚠️ Worker pool unavailable, starting {cmd[0]} instead: {e}")
+        return await self._run_process(cmd, env, output)
+
+    async def _run_pooled(self, cmd, env, output):
+        loop = asyncio.get_running_loop()
+
+        def forward(line):
+            # Called on the run's thread; job logs belong to the event loop
+            if output is not None:
+                loop.call_soon_threadsafe(output, line)
+
+        def settle(future):
+            if not future.done():
+                future.set_result(None)
+
+        # Resolved from the run's own thread; no executor thread waits for the run
+        done = loop.create_future()
+        run = self.pool.run(cmd[0], cmd[1:], env, forward)
+        run.add_done_callback(lambda _: loop.call_soon_threadsafe(settle, done))
+        try:
+            await asyncio.shield(done)
+            return run.wait()
+        except asyncio.CancelledError:
+            run.terminate()
+            await done
+            raise
+
+    async def _run_process(self, cmd, env, output):
+        stdout = asyncio.subprocess.PIPE if output is not None else asyncio.subprocess.DEVNULL
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=stdout,
+            stderr=asyncio.subprocess.STDOUT,
+            cwd=self.base_dir,
+            env={**os.environ, **env},
+            limit=STREAM_LIMIT,
+        )
+        try:
+            if output is not None:
+                async for line in proc.stdout:
+                    output(line.decode("utf-8", errors="replace"))
+            return await proc.wait()
+        except asyncio.CancelledError:
+            if proc.returncode is None:
+                proc.terminate()
+                await proc.wait()
+            raise
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+# --- CONFIG ---
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.getcwd(), ".cache", "llm", "responses.sqlite"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", 24 * 3600))  # seconds, 0 disables the cache
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 1000))
+
+
+def cache_key(model, system_prompt, messages):
+    """Content address of a request: model + system prompt (incl. file context) + history."""
+    payload = json.dumps([model, system_prompt, messages], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed LLM response cache with TTL expiry and LRU eviction.
+    Concurrent identical requests are coalesced: only the first caller
+    invokes the model, the others wait for its result.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inflight = {}
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT, response TEXT, created REAL, last_used REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_used)")
+        self._db.commit()
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            return row[0]
+
+    def put(self, key, model, response):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now),
+            )
+            # LRU: keep only the most recently used `max_entries` rows
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+
+    def get_or_compute(self, key, model, compute):
+        """Returns the cached response or calls `compute()` once per key."""
+        if not self.enabled:
+            return compute()
+
+        cached, pending = self.claim(key)
+        if cached is not None:
+            return cached
+        if pending is not None:
+            return pending.result()
+
+        try:
+            response = compute()
+        except Exception as e:
+            self.release(key, error=e)
+            raise
+        self.release(key, model, response)
+        return response
+
+    def claim(self, key):
+        """
+        For callers producing the response themselves (e.g. streaming).
+        Returns (cached response, None) on a hit, (None, future) while an
+        identical request is in flight, or (None, None) when the caller now
+        owns the key and must end it with release().
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached, None
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return None, future
+            self._inflight[key] = Future()
+
+        # Another owner may have finished between our lookup and the lock
+        cached = self.get(key)
+        if cached is not None:
+            self.release(key, response=cached, store=False)
+            return cached, None
+        return None, None
+
+    def release(self, key, model=None, response=None, error=None, store=True):
+        """Ends a claim: stores the response, or passes `error` on to the waiting callers."""
+        if error is None and store:
+            self.put(key, model, response)
+        with self._lock:
+            future = self._inflight.pop(key, None)
+        if future is None:
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(response)
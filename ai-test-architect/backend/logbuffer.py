@@ -0,0 +1,59 @@
+import asyncio
+import os
+from collections import deque
+from itertools import islice
+
+# --- CONFIG ---
+# Lines kept per job. Older lines are dropped; readers resuming from an
+# evicted cursor are fast-forwarded to the oldest line still available.
+LOG_BUFFER_LINES = int(os.getenv("LOG_BUFFER_LINES", 10000))
+
+
+class LogBuffer:
+    """
+    Bounded ring buffer of log lines addressed by a monotonically
+    increasing cursor (the absolute index of a line since the job started).
+    Written and read from the event loop only.
+    """
+
+    def __init__(self, maxlen=LOG_BUFFER_LINES):
+        self._lines = deque(maxlen=maxlen)
+        self._start = 0  # cursor of self._lines[0]
+        self._closed = False
+        self._changed = asyncio.Event()
+
+    @property
+    def end(self):
+        return self._start + len(self._lines)
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def append(self, line):
+        if len(self._lines) == self._lines.maxlen:
+            self._start += 1
+        self._lines.append(line)
+        self._changed.set()
+
+    def close(self):
+        """Marks the end of the stream so waiting readers can finish."""
+        self._closed = True
+        self._changed.set()
+
+    def read(self, cursor=0):
+        """Returns (lines, next_cursor, dropped) for everything after `cursor`."""
+        dropped = cursor < self._start
+        offset = max(cursor, self._start) - self._start
+        lines = list(islice(self._lines, offset, None))
+        return lines, self.end, dropped
+
+    async def wait(self, cursor, timeout=None):
+        """Waits until a line past `cursor` exists or the buffer is closed."""
+        while self.end <= cursor and not self._closed:
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                return False
+        return True
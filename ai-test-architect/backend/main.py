@@ -1,12 +1,25 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
-import subprocess
 import os
-import glob
-from typing import List
-from .agent import ask_agent
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from . import metrics
+from .agent import ask_agent, stream_agent
+from .jobs import DEFAULT_USER, JobScheduler
+from .project_index import ProjectIndex
+from .results_store import ResultsStore
+from .run_queue import QueueFull
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    # Jobs queued (or running) when the backend last stopped start again
+    scheduler.resume()
+    yield
+    await scheduler.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # --- CONFIG ---
 BASE_DIR = os.getcwd() # /workspaces/ai-test-architect
@@ -15,13 +28,24 @@ RESULTS_DIR = os.path.join(BASE_DIR, "results")
 os.makedirs(TESTS_DIR, exist_ok=True)
 os.makedirs(RESULTS_DIR, exist_ok=True)
 
-# --- GLOBAL STATE (MVP) ---
-runner_state = {
-    "process": None,
-    "logs": "",
-    "active_file": None,
-    "status": "idle" # idle, running, finished
-}
+# --- EXECUTION STATE ---
+results_store = ResultsStore(RESULTS_DIR)
+scheduler = JobScheduler(BASE_DIR, RESULTS_DIR, store=results_store)
+scheduler.warm_registry_index()
+scheduler.start_pool()
+project_index = ProjectIndex(TESTS_DIR, os.path.join(BASE_DIR, "project.md"))
+
+class ReportFiles(StaticFiles):
+    """Run artifacts (report.html, log.html, output.xml) with ETag and Range support."""
+
+    async def get_response(self, path, scope):
+        # Only artifacts inside a run directory, never the history database
+        if os.sep not in os.path.normpath(path):
+            raise HTTPException(404, "Not found")
+        return await super().get_response(path, scope)
+
+# The browser loads reports straight from here, the UI only passes the URL
+app.mount("/results", ReportFiles(directory=RESULTS_DIR), name="results")
 
 class ChatRequest(BaseModel):
     messages: List[dict]
@@ -36,16 +60,33 @@ class FileWriteRequest(BaseModel):
 def health():
     return {"status": "ok"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text format: hot-path histograms of the backend and its robot workers."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/files")
 def list_files():
-    files = [os.path.basename(f) for f in glob.glob(os.path.join(TESTS_DIR, "*.robot"))]
-    return {"files": sorted(files)}
+    project_index.refresh()
+    return {"files": project_index.files()}
+
+def _agent_context(messages):
+    """Compact index slice relevant to the latest user message."""
+    query = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+    return project_index.context_for(query)
 
 @app.post("/chat")
 def chat(req: ChatRequest):
-    files = list_files()["files"]
-    response = ask_agent(req.messages, f"Files: {files}")
-    return {"content": response}
+    response, usage = ask_agent(req.messages, _agent_context(req.messages))
+    return {"content": response, "usage": usage}
+
+@app.post("/chat/stream")
+def chat_stream(req: ChatRequest):
+    """Forwards the completion as plain-text chunks while the model generates it."""
+    usage, tokens = stream_agent(req.messages, _agent_context(req.messages))
+    # Token counts are known before the first chunk, so they travel as headers
+    headers = {f"X-Usage-{key.replace('_', '-')}": str(value) for key, value in usage.items()}
+    return StreamingResponse(tokens, media_type="text/plain; charset=utf-8", headers=headers)
 
 @app.post("/files")
 def save_file(req: FileWriteRequest):
@@ -57,56 +98,139 @@ def save_file(req: FileWriteRequest):
 # --- EXECUTION ENGINE ---
 
 @app.post("/run/{filename}")
-def run_test(filename: str):
+async def run_test(filename: str, affected: bool = False, priority: int = 0, x_user: Optional[str] = Header(None)):
+    """
+    Queues the suite; with `affected=true` only tests whose dependencies
+    changed. Higher `priority` starts first. 429 when the queue is full.
+    """
     path = os.path.join(TESTS_DIR, filename)
     if not os.path.exists(path):
         raise HTTPException(404, "File not found")
     
-    # Reset State
-    runner_state["logs"] = f"🚀 Starting {filename}...\n"
-    runner_state["active_file"] = filename
-    runner_state["status"] = "running"
-    
-    cmd = ["robot", "--outputdir", RESULTS_DIR, path]
-    
-    # Start Async
-    runner_state["process"] = subprocess.Popen(
-        cmd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1,
-        cwd=BASE_DIR
-    )
-    return {"status": "started"}
+    try:
+        job = scheduler.submit(filename, path, affected_only=affected, user=x_user or DEFAULT_USER, priority=priority)
+    except QueueFull as e:
+        raise HTTPException(429, str(e), headers={"Retry-After": str(e.retry_after)})
+    return {"status": job.status, "job_id": job.id}
+
+@app.get("/impact/{filename}")
+def get_impact(filename: str):
+    """Preview of `run affected`: the tests that would run and the changes behind them."""
+    path = os.path.join(TESTS_DIR, filename)
+    if not os.path.exists(path):
+        raise HTTPException(404, "File not found")
+    graph = scheduler.impact.graph(path)
+    affected, reasons = scheduler.impact.affected(path, graph)
+    return {
+        "file": filename,
+        "total": len(graph),
+        "affected": [{"test": name, "changed": reasons[name]} for name in affected],
+    }
+
+@app.get("/queue")
+async def get_queue():
+    """Waiting jobs in start order, with the caps that hold them back."""
+    return {
+        "queued": [job.to_dict() for job in scheduler.queued()],
+        "running": [job.to_dict() for job in scheduler.jobs.values() if job.status == "running"],
+        "max_jobs": scheduler.max_jobs,
+        "max_jobs_per_user": scheduler.max_jobs_per_user,
+        "limit": scheduler.queue.limit,
+    }
+
+@app.get("/jobs")
+async def list_jobs():
+    return {"jobs": [job.to_dict() for job in scheduler.jobs.values()]}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    return _get_job(job_id).to_dict()
+
+@app.post("/jobs/{job_id}/abort")
+async def abort_job(job_id: str):
+    job = _get_job(job_id)
+    if not scheduler.abort(job):
+        raise HTTPException(409, f"Job is {job.status}")
+    return {"status": "aborting", "job_id": job.id}
+
+@app.get("/jobs/{job_id}/logs")
+async def get_job_logs(job_id: str, cursor: int = 0):
+    """Incremental log read: returns only the lines after `cursor`."""
+    job = _get_job(job_id)
+    lines, next_cursor, dropped = job.buffer.read(cursor)
+    return {
+        "status": job.status,
+        "logs": "".join(lines),
+        "cursor": next_cursor,
+        "dropped": dropped
+    }
+
+@app.get("/jobs/{job_id}/stream")
+async def stream_job_logs(job_id: str, cursor: int = 0, last_event_id: Optional[str] = Header(None)):
+    """
+    Server-Sent Events stream of the job log. The event id is the line cursor,
+    so a reconnecting EventSource resumes via the Last-Event-ID header.
+    """
+    job = _get_job(job_id)
+    if last_event_id is not None:
+        try:
+            cursor = int(last_event_id) + 1
+        except ValueError:
+            pass  # not an id we sent; resume from `cursor`
+
+    async def events(cursor):
+        while True:
+            await job.buffer.wait(cursor, timeout=15)
+            lines, next_cursor, _ = job.buffer.read(cursor)
+            start = next_cursor - len(lines)
+            for offset, line in enumerate(lines):
+                data = "\ndata: ".join(line.rstrip("\n").split("\n"))
+                yield f"id: {start + offset}\ndata: {data}\n\n"
+            if not lines and not job.buffer.closed:
+                yield ": keep-alive\n\n"
+            cursor = next_cursor
+            if job.buffer.closed and cursor >= job.buffer.end:
+                yield f"event: end\ndata: {job.result}\n\n"
+                return
+
+    return StreamingResponse(events(cursor), media_type="text/event-stream")
 
 @app.get("/status")
-def get_status():
-    proc = runner_state["process"]
+async def get_status(cursor: int = 0):
+    """Status of the most recent job (kept for the single-console UI)."""
+    job = scheduler.latest()
+    if not job:
+        return {"status": "idle", "logs": "", "file": None, "job_id": None, "cursor": 0}
     
-    if proc:
-        # 1. Read new logs
-        try:
-            # Set non-blocking read
-            import fcntl
-            fd = proc.stdout.fileno()
-            fl = fcntl.fcntl(fd, fcntl.F_GETFL)
-            fcntl.fcntl(fd, fcntl.F_SETFL, fl | os.O_NONBLOCK)
-            
-            chunk = proc.stdout.read()
-            if chunk: runner_state["logs"] += chunk
-        except: pass
-        
-        # 2. Check finish
-        ret = proc.poll()
-        if ret is not None:
-            runner_state["status"] = "finished"
-            runner_state["process"] = None
-            status_text = "PASS" if ret == 0 else "FAIL"
-            runner_state["logs"] += f"\n[Process Finished: {status_text}]"
-            
+    lines, next_cursor, _ = job.buffer.read(cursor)
     return {
-        "status": runner_state["status"],
-        "logs": runner_state["logs"],
-        "file": runner_state["active_file"]
-    }
\ No newline at end of file
+        "status": job.status,
+        "logs": "".join(lines),
+        "file": job.filename,
+        "job_id": job.id,
+        "cursor": next_cursor
+    }
+
+# --- RUN HISTORY ---
+
+@app.get("/history/runs")
+def list_runs(limit: int = 50, offset: int = 0, file: Optional[str] = None):
+    return {"runs": results_store.runs(limit, offset, file)}
+
+@app.get("/history/runs/{run_id}")
+def get_run(run_id: str, status: Optional[str] = None, limit: int = 100, offset: int = 0):
+    run = results_store.run(run_id)
+    if not run:
+        raise HTTPException(404, "Run not found")
+    return {**run, "tests": results_store.tests(run_id, status, limit, offset)}
+
+@app.get("/history/tests")
+def get_test_history(name: str, limit: int = 50):
+    """Outcomes of one test (by full name) across past runs, newest first."""
+    return {"name": name, "runs": results_store.test_history(name, limit)}
+
+def _get_job(job_id):
+    job = scheduler.get(job_id)
+    if not job:
+        raise HTTPException(404, "Job not found")
+    return job
\ No newline at end of file
@@ -0,0 +1,108 @@
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Prometheus' default buckets, plus a long tail for runs and merges
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LONG_BUCKETS = DEFAULT_BUCKETS + (30, 60, 120, 300, 600, 1800)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in Prometheus' text exposition format."""
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        values = tuple(str(labels.get(label, "")) for label in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(values)
+            if series is None:
+                series = self._series[values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {values: list(counts) for values, counts in self._series.items()}
+        for values, counts in sorted(series.items()):
+            pairs = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, values)]
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(pairs, bound)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(pairs, '+Inf')} {counts[-1]}")
+            suffix = _labels(pairs)
+            lines.append(f"{self.name}_sum{suffix} {counts[-2]}")
+            lines.append(f"{self.name}_count{suffix} {counts[-1]}")
+        return "\n".join(lines)
+
+
+def _labels(pairs, le=None):
+    if le is not None:
+        pairs = pairs + [f'le="{le}"']
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# --- METRICS ---
+
+# Reported by the Robot libraries through ROBOT_METRICS_FILE (see custom-libs/_metrics.py)
+YAML_LOAD = Histogram("robot_yaml_load_seconds", "DataLoader testdata load", ["source"])
+EXPANSION = Histogram("robot_scenario_expansion_seconds", "DataLoader expansion of one template test", ["mode"])
+REGISTRY_LOAD = Histogram("robot_registry_load_seconds", "ContextBuilder Load Registry incl. compilation")
+PAYLOAD_RENDER = Histogram("robot_payload_render_seconds", "ContextBuilder payload build", ["mode"])
+
+# Measured in the backend itself
+LLM_REQUEST = Histogram("llm_request_seconds", "LLM call until the full response", ["kind", "cache"], LONG_BUCKETS)
+LLM_FIRST_TOKEN = Histogram("llm_first_token_seconds", "Streaming LLM call until the first chunk")
+PROMPT_TOKENS = Histogram("llm_prompt_tokens", "Tokens per chat prompt", ["part"], TOKEN_BUCKETS)
+WORKER = Histogram("runner_subprocess_seconds", "Lifetime of a robot/rebot subprocess", ["kind"], LONG_BUCKETS)
+JOB = Histogram("runner_job_seconds", "Job duration from start to result", ["result"], LONG_BUCKETS)
+
+REGISTRY = [
+    YAML_LOAD, EXPANSION, REGISTRY_LOAD, PAYLOAD_RENDER, LLM_REQUEST, LLM_FIRST_TOKEN, PROMPT_TOKENS, WORKER, JOB,
+]
+_LIBRARY_METRICS = {h.name: h for h in (YAML_LOAD, EXPANSION, REGISTRY_LOAD, PAYLOAD_RENDER)}
+
+
+def render():
+    return "\n".join(h.render() for h in REGISTRY) + "\n"
+
+
+def load_library_metrics(path):
+    """Observes the timings a robot process appended to its ROBOT_METRICS_FILE (JSON lines)."""
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    histogram = _LIBRARY_METRICS[record["metric"]]
+                    histogram.observe(float(record["seconds"]), **record.get("labels", {}))
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except FileNotFoundError:
+        pass
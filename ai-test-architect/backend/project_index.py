@@ -0,0 +1,256 @@
+import os
+import re
+import threading
+
+import yaml
+from robot.api import get_model
+from robot.api.parsing import ModelVisitor
+
+# Optional: with watchdog installed, refresh() only touches changed files.
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler, Observer = object, None
+
+# Scenario names listed per test in the agent context
+MAX_SCENARIOS = 10
+
+
+def _words(text):
+    return {w for w in re.split(r"[^a-z0-9]+", text.lower()) if len(w) > 2}
+
+
+class _SuiteParser(ModelVisitor):
+    """Collects tests, keywords, variables and tags from a parsed .robot model."""
+
+    def __init__(self):
+        self.tests = []
+        self.keywords = []
+        self.variables = []
+        self.suite_tags = []
+
+    def visit_TestTags(self, node):
+        self.suite_tags.extend(node.values)
+
+    def visit_Keyword(self, node):
+        self.keywords.append(node.name)
+
+    def visit_Variable(self, node):
+        if node.name:
+            self.variables.append(node.name)
+
+    def visit_TestCase(self, node):
+        tags = []
+        for item in node.body:
+            if type(item).__name__ == "Tags":
+                tags.extend(item.values)
+        self.tests.append({"name": node.name, "tags": tags})
+
+
+class _DirtyTracker(FileSystemEventHandler):
+    def __init__(self, index):
+        self.index = index
+
+    def on_any_event(self, event):
+        if event.event_type in ("opened", "closed_no_write"):
+            return
+        for path in (event.src_path, getattr(event, "dest_path", "")):
+            if path:
+                self.index._mark_dirty(path)
+
+
+class ProjectIndex:
+    """
+    In-memory index of the *.robot files in `tests_dir`: tests, tags,
+    keywords and variables, plus the DataLoader scenarios of each test.
+
+    refresh() re-parses only files whose mtime/size changed (or, with
+    watchdog, only files reported by inotify) and rewrites `index_file`
+    only when its rendered content actually changed. context_for() picks
+    a compact, query-relevant slice of the index for the agent prompt.
+    """
+
+    def __init__(self, tests_dir, index_file=None, watch=True, root_dir=None, env_name="UAT"):
+        self.tests_dir = tests_dir
+        self.index_file = index_file
+        # DataLoader layout: testcases/<rel>.robot -> resources/config/testdata/<env>/<rel>.yaml
+        root_dir = root_dir or os.path.dirname(os.path.abspath(tests_dir))
+        self.testcases_dir = os.path.join(root_dir, "testcases")
+        self.testdata_dir = os.path.join(root_dir, "resources", "config", "testdata", env_name)
+        self.suites = {}  # filename -> {"stamp", "tests", "keywords", "variables", "suite_tags"}
+        self._scenarios = {}  # yaml path -> (stamp, {test name: [iteration names]})
+        self._lock = threading.Lock()
+        self._dirty = None  # None = full scan needed, else set of changed filenames
+        self._observer = None
+        self._written = None
+        if watch and Observer is not None and os.path.isdir(tests_dir):
+            self._observer = Observer()
+            self._observer.schedule(_DirtyTracker(self), tests_dir, recursive=False)
+            self._observer.daemon = True
+            self._observer.start()
+
+    def files(self):
+        return sorted(self.suites)
+
+    def context_for(self, query, limit=3):
+        """
+        Agent context: every filename, plus full details (tests, tags,
+        scenarios, keywords, variables) of the `limit` suites best matching `query`.
+        """
+        self.refresh()
+        with self._lock:
+            wanted = _words(query)
+            # Rarer words weigh more: a word found in every suite says nothing
+            frequency = {w: sum(w in e["words"] for e in self.suites.values()) for w in wanted}
+            ranked = sorted(
+                (
+                    (sum(1 / frequency[w] for w in wanted & entry["words"]), name)
+                    for name, entry in self.suites.items()
+                ),
+                key=lambda item: (-item[0], item[1]),
+            )
+            lines = [f"Files: {self.files()}"]
+            relevant = [name for score, name in ranked[:limit] if score]
+            if relevant:
+                lines.append("Relevant suites:")
+            for name in relevant:
+                entry = self.suites[name]
+                scenarios = self._load_scenarios(name)
+                lines.append(f"- {name}")
+                for test in entry["tests"]:
+                    tags = entry["suite_tags"] + test["tags"]
+                    line = f"    test: {test['name']}"
+                    if tags:
+                        line += f" [tags: {', '.join(tags)}]"
+                    if test["name"] in scenarios:
+                        names = scenarios[test["name"]]
+                        more = f" (+{len(names) - MAX_SCENARIOS} more)" if len(names) > MAX_SCENARIOS else ""
+                        line += f" [scenarios: {', '.join(names[:MAX_SCENARIOS])}{more}]"
+                    lines.append(line)
+                if entry["keywords"]:
+                    lines.append(f"    keywords: {', '.join(entry['keywords'])}")
+                if entry["variables"]:
+                    lines.append(f"    variables: {', '.join(entry['variables'])}")
+            return "\n".join(lines)
+
+    def refresh(self):
+        """Brings the index up to date. Returns True if anything changed."""
+        with self._lock:
+            if self._observer is not None and self._dirty is not None:
+                names, self._dirty = self._dirty, set()
+                changed = self._update(names)
+            else:
+                changed = self._rescan()
+                if self._observer is not None:
+                    self._dirty = set()
+            if changed or self._written is None:
+                self._write_index()
+            return changed
+
+    # --- INTERNALS ---
+
+    def _mark_dirty(self, path):
+        name = os.path.basename(path)
+        if name.endswith(".robot"):
+            with self._lock:
+                if self._dirty is not None:
+                    self._dirty.add(name)
+
+    def _rescan(self):
+        if not os.path.isdir(self.tests_dir):
+            changed = bool(self.suites)
+            self.suites.clear()
+            return changed
+        names = {e.name for e in os.scandir(self.tests_dir) if e.name.endswith(".robot") and e.is_file()}
+        return self._update(names | set(self.suites))
+
+    def _update(self, names):
+        changed = False
+        for name in names:
+            path = os.path.join(self.tests_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                changed |= self.suites.pop(name, None) is not None
+                continue
+            stamp = (stat.st_mtime_ns, stat.st_size)
+            entry = self.suites.get(name)
+            if entry and entry["stamp"] == stamp:
+                continue
+            self.suites[name] = self._parse(path, stamp)
+            changed = True
+        return changed
+
+    def _parse(self, path, stamp):
+        parser = _SuiteParser()
+        try:
+            parser.visit(get_model(path))
+        except Exception as e:
+            print(f"⚠️ Could not parse {path}: {e}")
+        words = _words(os.path.splitext(os.path.basename(path))[0])
+        for text in [t["name"] for t in parser.tests] + [tag for t in parser.tests for tag in t["tags"]] \
+                + parser.keywords + parser.variables + parser.suite_tags:
+            words |= _words(text)
+        return {
+            "stamp": stamp,
+            "tests": parser.tests,
+            "keywords": parser.keywords,
+            "variables": parser.variables,
+            "suite_tags": parser.suite_tags,
+            "words": words,
+        }
+
+    def _load_scenarios(self, name):
+        """IterationNames per test from the suite's testdata YAML, cached by mtime/size."""
+        rel_path = os.path.relpath(os.path.join(self.tests_dir, name), self.testcases_dir)
+        yaml_path = os.path.normpath(os.path.join(self.testdata_dir, os.path.splitext(rel_path)[0] + ".yaml"))
+        try:
+            stat = os.stat(yaml_path)
+        except FileNotFoundError:
+            return {}
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cached = self._scenarios.get(yaml_path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+        scenarios = {}
+        try:
+            with open(yaml_path, "r") as f:
+                data = yaml.safe_load(f) or {}
+            for test_name, config in data.items():
+                items = (config or {}).get("TestScenarios", []) if isinstance(config, dict) else []
+                scenarios[test_name] = [
+                    (item.get("RunSettings") or {}).get("IterationName", f"iter_{i + 1}")
+                    for i, item in enumerate(items)
+                ]
+        except Exception as e:
+            print(f"⚠️ Could not parse {yaml_path}: {e}")
+        self._scenarios[yaml_path] = (stamp, scenarios)
+        return scenarios
+
+    def _render(self):
+        lines = ["# Project Index", "", f"**Location:** `{self.tests_dir}`", "", "## Files:"]
+        for name in self.files():
+            entry = self.suites[name]
+            lines.append(f"- **{name}**")
+            for test in entry["tests"]:
+                tags = entry["suite_tags"] + test["tags"]
+                suffix = f" `[{', '.join(tags)}]`" if tags else ""
+                lines.append(f"    - {test['name']}{suffix}")
+        return "\n".join(lines) + "\n"
+
+    def _write_index(self):
+        if not self.index_file:
+            return
+        content = self._render()
+        if content == self._written:
+            return
+        if self._written is None and os.path.exists(self.index_file):
+            with open(self.index_file, "r") as f:
+                if f.read() == content:
+                    self._written = content
+                    return
+        with open(self.index_file, "w") as f:
+            f.write(content)
+        self._written = content
@@ -0,0 +1,187 @@
+import os
+import re
+import sqlite3
+import threading
+import xml.etree.ElementTree as ET
+from datetime import datetime
+
+# --- CONFIG ---
+HISTORY_DB = "history.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY, file TEXT, created TEXT, output_dir TEXT,
+    status TEXT, passed INTEGER, failed INTEGER, skipped INTEGER, elapsed REAL
+);
+CREATE TABLE IF NOT EXISTS suites (
+    run_id TEXT, suite_id TEXT, full_name TEXT, source TEXT, status TEXT, elapsed REAL,
+    PRIMARY KEY (run_id, suite_id)
+);
+CREATE TABLE IF NOT EXISTS tests (
+    run_id TEXT, test_id TEXT, suite_id TEXT, name TEXT, full_name TEXT,
+    status TEXT, elapsed REAL, message TEXT, tags TEXT,
+    PRIMARY KEY (run_id, test_id)
+);
+CREATE INDEX IF NOT EXISTS tests_full_name ON tests (full_name, run_id);
+CREATE INDEX IF NOT EXISTS tests_status ON tests (run_id, status);
+CREATE INDEX IF NOT EXISTS runs_created ON runs (created);
+"""
+
+# Prefix `rebot --merge` adds to every test status of a sharded job
+_MERGE_NOTE = re.compile(r"^\*HTML\* Test added from merged output\.(<hr>)?")
+
+def _elapsed(status):
+    """Seconds from an RF 7 `elapsed` attribute, or from RF 6 start/end times."""
+    if status.get("elapsed") is not None:
+        return float(status.get("elapsed"))
+    start, end = status.get("starttime"), status.get("endtime")
+    if not start or not end or "N/A" in (start, end):
+        return None
+    fmt = "%Y%m%d %H:%M:%S.%f"
+    return (datetime.strptime(end, fmt) - datetime.strptime(start, fmt)).total_seconds()
+
+
+def parse_output(path):
+    """
+    Streams an output.xml with iterparse and returns (suites, tests).
+    Every element is detached from its parent as soon as it closes, so
+    memory stays flat no matter how many keywords the run logged.
+    """
+    suites, tests = [], []
+    stack = []  # (element, collected fields) of every open element
+    names = []  # suite name path
+    for event, elem in ET.iterparse(path, events=("start", "end")):
+        if event == "start":
+            # <statistics> also has <suite> elements; only the result tree counts
+            in_tree = elem.tag == "suite" and (not stack or stack[-1][0].tag in ("robot", "suite"))
+            stack.append((elem, {"tags": [], "in_tree": in_tree}))
+            if in_tree:
+                names.append(elem.get("name"))
+            continue
+
+        _, fields = stack.pop()
+        parent, parent_fields = stack[-1] if stack else (None, None)
+        if elem.tag == "status" and parent is not None and parent.tag in ("suite", "test"):
+            parent_fields["status"] = elem.get("status")
+            parent_fields["elapsed"] = _elapsed(elem)
+            parent_fields["message"] = _MERGE_NOTE.sub("", elem.text or "")
+        elif elem.tag == "tag" and parent is not None and parent.tag == "test":
+            parent_fields["tags"].append(elem.text or "")
+        elif elem.tag == "test":
+            tests.append({
+                "test_id": elem.get("id"),
+                "suite_id": parent.get("id") if parent is not None else None,
+                "name": elem.get("name"),
+                "full_name": ".".join(names + [elem.get("name")]),
+                "status": fields.get("status"),
+                "elapsed": fields.get("elapsed"),
+                "message": fields.get("message", ""),
+                "tags": ",".join(fields["tags"]),
+            })
+        elif fields["in_tree"]:
+            suites.append({
+                "suite_id": elem.get("id"),
+                "full_name": ".".join(names),
+                "source": elem.get("source"),
+                "status": fields.get("status"),
+                "elapsed": fields.get("elapsed"),
+            })
+            names.pop()
+        if parent is not None:
+            parent.remove(elem)
+    return suites, tests
+
+
+class ResultsStore:
+    """SQLite history of every run: runs, suites and tests parsed from output.xml."""
+
+    def __init__(self, results_dir, filename=HISTORY_DB):
+        os.makedirs(results_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(results_dir, filename), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def ingest(self, run_id, output_xml, file=None, created=None):
+        """Parses `output_xml` and stores it as run `run_id`. Returns the run row."""
+        suites, tests = parse_output(output_xml)
+        counts = {s: sum(t["status"] == s for t in tests) for s in ("PASS", "FAIL", "SKIP")}
+        top = next((s for s in reversed(suites) if "-" not in s["suite_id"]), None)
+        run = {
+            "run_id": run_id,
+            "file": file,
+            "created": created or datetime.now().isoformat(timespec="seconds"),
+            "output_dir": os.path.dirname(os.path.abspath(output_xml)),
+            "status": "FAIL" if counts["FAIL"] else "PASS",
+            "passed": counts["PASS"],
+            "failed": counts["FAIL"],
+            "skipped": counts["SKIP"],
+            "elapsed": top["elapsed"] if top else None,
+        }
+        with self._lock:
+            self._db.execute("DELETE FROM suites WHERE run_id = ?", (run_id,))
+            self._db.execute("DELETE FROM tests WHERE run_id = ?", (run_id,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO runs VALUES (:run_id, :file, :created, :output_dir,"
+                " :status, :passed, :failed, :skipped, :elapsed)", run
+            )
+            self._db.executemany(
+                "INSERT INTO suites VALUES (:run_id, :suite_id, :full_name, :source, :status, :elapsed)",
+                [{**s, "run_id": run_id} for s in suites],
+            )
+            self._db.executemany(
+                "INSERT INTO tests VALUES (:run_id, :test_id, :suite_id, :name, :full_name,"
+                " :status, :elapsed, :message, :tags)",
+                [{**t, "run_id": run_id} for t in tests],
+            )
+            self._db.commit()
+        return run
+
+    # --- QUERIES ---
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self._db.execute(sql, params).fetchall()]
+
+    def runs(self, limit=50, offset=0, file=None):
+        where, params = ("WHERE file = ?", (file,)) if file else ("", ())
+        return self._query(
+            f"SELECT * FROM runs {where} ORDER BY created DESC LIMIT ? OFFSET ?", (*params, limit, offset)
+        )
+
+    def run(self, run_id):
+        rows = self._query("SELECT * FROM runs WHERE run_id = ?", (run_id,))
+        return rows[0] if rows else None
+
+    def tests(self, run_id, status=None, limit=100, offset=0):
+        where, params = ("AND status = ?", (status,)) if status else ("", ())
+        return self._query(
+            f"SELECT * FROM tests WHERE run_id = ? {where} ORDER BY rowid LIMIT ? OFFSET ?",
+            (run_id, *params, limit, offset),
+        )
+
+    def durations(self, full_names, last=5):
+        """Mean elapsed seconds of each test over its `last` recorded (non-skipped) runs."""
+        found = {}
+        names = list(full_names)
+        for start in range(0, len(names), 500):
+            chunk = names[start:start + 500]
+            rows = self._query(
+                "SELECT full_name, AVG(elapsed) AS elapsed FROM ("
+                " SELECT full_name, elapsed, ROW_NUMBER() OVER ("
+                "  PARTITION BY full_name ORDER BY rowid DESC) AS n FROM tests"
+                f" WHERE full_name IN ({','.join('?' * len(chunk))})"
+                "  AND status != 'SKIP' AND elapsed IS NOT NULL"
+                ") WHERE n <= ? GROUP BY full_name",
+                (*chunk, last),
+            )
+            found.update((row["full_name"], row["elapsed"]) for row in rows)
+        return found
+
+    def test_history(self, full_name, limit=50):
+        return self._query(
+            "SELECT t.*, r.created FROM tests t JOIN runs r USING (run_id)"
+            " WHERE t.full_name = ? ORDER BY r.created DESC LIMIT ?",
+            (full_name, limit),
+        )
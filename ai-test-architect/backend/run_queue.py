@@ -0,0 +1,94 @@
+import os
+import sqlite3
+import threading
+
+# --- CONFIG ---
+QUEUE_DB = "queue.sqlite"
+# Waiting jobs accepted in total / per user before /run answers 429.
+QUEUE_LIMIT = int(os.getenv("RUNNER_QUEUE_LIMIT", 50))
+USER_QUEUE_LIMIT = int(os.getenv("RUNNER_USER_QUEUE_LIMIT", 10))
+# Seconds a rejected client is asked to wait (Retry-After).
+RETRY_AFTER = int(os.getenv("RUNNER_RETRY_AFTER", 10))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, job_id TEXT UNIQUE, filename TEXT, path TEXT,
+    user TEXT, priority INTEGER, affected_only INTEGER, created TEXT, state TEXT
+);
+CREATE INDEX IF NOT EXISTS queue_order ON queue (state, priority DESC, seq);
+"""
+
+
+class QueueFull(Exception):
+    """The job was rejected; the client should retry after `retry_after` seconds."""
+
+    def __init__(self, message, retry_after=RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RunQueue:
+    """
+    SQLite-backed run queue: highest priority first, FIFO within a priority.
+    A job's row lives from submit until the job ends (state queued, then
+    running), so after a backend restart every job that had not finished
+    can be queued again.
+    """
+
+    def __init__(self, results_dir, filename=QUEUE_DB, limit=QUEUE_LIMIT, user_limit=USER_QUEUE_LIMIT):
+        os.makedirs(results_dir, exist_ok=True)
+        self.limit = limit
+        self.user_limit = user_limit
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(results_dir, filename), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def push(self, job):
+        """Appends a queued job; raises QueueFull when the global or the user's queue is full."""
+        with self._lock:
+            queued, by_user = self._db.execute(
+                "SELECT COUNT(*), COUNT(CASE WHEN user = ? THEN 1 END) FROM queue WHERE state = 'queued'",
+                (job.user,),
+            ).fetchone()
+            if queued >= self.limit:
+                raise QueueFull(f"Run queue is full ({queued} jobs waiting)")
+            if by_user >= self.user_limit:
+                raise QueueFull(f"{job.user} already has {by_user} jobs waiting")
+            self._db.execute(
+                "INSERT INTO queue (job_id, filename, path, user, priority, affected_only, created, state)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, 'queued')",
+                (job.id, job.filename, job.path, job.user, job.priority, int(job.affected_only), job.created),
+            )
+            self._db.commit()
+
+    def pending(self):
+        """Queued jobs in dispatch order."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM queue WHERE state = 'queued' ORDER BY priority DESC, seq"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def mark_running(self, job_id):
+        with self._lock:
+            self._db.execute("UPDATE queue SET state = 'running' WHERE job_id = ?", (job_id,))
+            self._db.commit()
+
+    def remove(self, job_id):
+        with self._lock:
+            self._db.execute("DELETE FROM queue WHERE job_id = ?", (job_id,))
+            self._db.commit()
+
+    def recover(self):
+        """
+        After a restart: jobs that were running were killed with the old
+        process, so they are queued again (keeping their place). Returns
+        every unfinished job in submission order.
+        """
+        with self._lock:
+            self._db.execute("UPDATE queue SET state = 'queued' WHERE state = 'running'")
+            self._db.commit()
+            rows = self._db.execute("SELECT * FROM queue ORDER BY seq").fetchall()
+        return [dict(row) for row in rows]
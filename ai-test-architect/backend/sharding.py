@@ -0,0 +1,124 @@
+"""
+Duration-aware test sharding.
+
+Tests are packed longest-processing-time first: sorted by their expected
+duration (mean of the last recorded runs in the run history) and each one
+goes to the currently least-loaded shard. Tests without history get the
+median of the known durations.
+
+CLI, for splitting one suite across machines that share results/history.sqlite:
+    python -m backend.sharding --shard 2/4 tests/hello.robot [-- robot options]
+    python -m backend.sharding --shard 1/4 --dry-run tests/hello.robot
+"""
+import argparse
+import heapq
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Expected seconds per test when there is no history at all
+DEFAULT_DURATION = 1.0
+
+
+def _escape_pattern(name):
+    """Escapes Robot's glob characters so `--test` matches the literal name."""
+    return "".join(f"[{c}]" if c in "*?[]" else c for c in name)
+
+
+def write_argfile(path, tests):
+    """Robot argument file selecting exactly `tests` (full names)."""
+    with open(path, "w") as f:
+        f.writelines(f"--test {_escape_pattern(name)}\n" for name in tests)
+
+
+def estimate(tests, durations):
+    """Expected seconds per test; unknown tests get the median known duration."""
+    known = [durations[t] for t in tests if durations.get(t) is not None]
+    fallback = statistics.median(known) if known else DEFAULT_DURATION
+    return {t: durations[t] if durations.get(t) is not None else fallback for t in tests}
+
+
+def plan(tests, durations, count):
+    """
+    Splits `tests` into at most `count` shards with LPT bin packing.
+    Returns (shards, predicted seconds per shard). Deterministic for the
+    same input, so every machine of a `--shard i/N` run computes the same plan.
+    """
+    count = min(count, len(tests))
+    if count == 0:
+        return [], []
+    expected = estimate(tests, durations)
+    shards = [[] for _ in range(count)]
+    loads = [0.0] * count
+    heap = [(0.0, index) for index in range(count)]
+    for test in sorted(tests, key=lambda t: (-expected[t], t)):
+        load, index = heapq.heappop(heap)
+        shards[index].append(test)
+        loads[index] = load + expected[test]
+        heapq.heappush(heap, (loads[index], index))
+    # Keep suite order inside a shard, it is the order Robot runs them in anyway
+    order = {test: position for position, test in enumerate(tests)}
+    return [sorted(shard, key=order.get) for shard in shards], loads
+
+
+def _parse_shard(value):
+    try:
+        index, total = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got '{value}'")
+    if not 1 <= index <= total:
+        raise argparse.ArgumentTypeError(f"shard {index} out of range 1..{total}")
+    return index, total
+
+
+def main(argv=None):
+    from .jobs import TEST_ENV, collect_tests
+    from .results_store import ResultsStore
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shard", type=_parse_shard, required=True, metavar="i/N")
+    parser.add_argument("--env", default=TEST_ENV)
+    parser.add_argument("--outputdir", help="default: results/shard_<i>_of_<N>")
+    parser.add_argument("--dry-run", action="store_true", help="print the plan instead of running")
+    parser.add_argument("suite")
+    parser.add_argument("robot_args", nargs="*", help="extra robot options (after --)")
+    args = parser.parse_args(argv)
+
+    # Same layout as the backend: DataLoader resolves paths relative to the cwd
+    base_dir = os.getcwd()
+    results_dir = os.path.join(base_dir, "results")
+    data_loader = os.path.join(base_dir, "resources", "keywords", "custom-libs", "DataLoader.py")
+    index, total = args.shard
+
+    tests = collect_tests(args.suite, data_loader, args.env)
+    durations = ResultsStore(results_dir).durations(tests)
+    shards, loads = plan(tests, durations, total)
+    print(f"{len(tests)} tests, history for {sum(t in durations for t in tests)}, "
+          f"predicted makespan {max(loads, default=0):.1f}s")
+    if args.dry_run:
+        for number, (shard, load) in enumerate(zip(shards, loads), 1):
+            marker = "*" if number == index else " "
+            print(f"{marker} shard {number}/{total}: {len(shard)} tests, {load:.1f}s")
+        return 0
+    if index > len(shards):
+        print(f"Shard {index}/{total} is empty (only {len(tests)} tests)")
+        return 0
+
+    output_dir = args.outputdir or os.path.join(results_dir, f"shard_{index}_of_{total}")
+    os.makedirs(output_dir, exist_ok=True)
+    arg_file = os.path.join(output_dir, "tests.args")
+    write_argfile(arg_file, shards[index - 1])
+    cmd = ["robot", "--argumentfile", arg_file, "--outputdir", output_dir, *args.robot_args, args.suite]
+    if os.path.exists(data_loader):
+        cmd[1:1] = ["--prerunmodifier", f"{data_loader}:{args.env}"]
+
+    start = time.monotonic()
+    code = subprocess.run(cmd, cwd=base_dir).returncode
+    print(f"Shard {index}/{total}: predicted {loads[index - 1]:.1f}s, actual {time.monotonic() - start:.1f}s")
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,456 @@
+"""
+Warm pool of Robot Framework worker processes.
+
+Starting the `robot` CLI re-imports Robot Framework, PyYAML, Jinja2 and the
+custom libraries for every run. Pool workers import all of that once, then
+take run requests over a local socket (multiprocessing.connection) and call
+Robot in-process, each run with its own --outputdir. A worker exits after
+RECYCLE_AFTER runs and is replaced, so whatever a run leaks (module state,
+memory) is gone a few runs later. A worker whose imported project files
+changed on disk refuses the next run and is replaced as well.
+
+Worker side (started by the pool):
+    python -m backend.worker_pool <address> <recycle after>
+"""
+import contextlib
+import importlib
+import os
+import queue
+import signal
+import subprocess
+import sys
+import threading
+from multiprocessing.connection import Client, Listener
+
+# --- CONFIG ---
+# Runs per worker process before it is replaced.
+RECYCLE_AFTER = int(os.getenv("RUNNER_RECYCLE_AFTER", 50))
+# Seconds to wait for a free (or freshly started) worker before giving up.
+START_TIMEOUT = float(os.getenv("RUNNER_START_TIMEOUT", 60))
+# Hex authkey handed to the workers; never passed on to the runs themselves.
+AUTHKEY_ENV = "ROBOT_POOL_AUTHKEY"
+# Imported before the first run so it is not paid per run.
+PRELOAD = (
+    "yaml", "jinja2", "robot.running", "robot.result", "robot.reporting", "robot.libraries.BuiltIn",
+)
+
+
+class PoolError(RuntimeError):
+    """No warm worker could take the run."""
+
+
+# --- POOL (server side) ---
+
+class _Worker:
+    __slots__ = ("proc", "conn", "runs")
+
+    def __init__(self, proc):
+        self.proc = proc
+        self.conn = None
+        self.runs = 0
+
+
+class WorkerPool:
+    """
+    Keeps `size` pre-imported worker processes connected. Runs are
+    dispatched with run(), which returns a Popen-like PooledRun at once.
+    """
+
+    def __init__(self, base_dir, size, recycle_after=RECYCLE_AFTER):
+        self.base_dir = base_dir
+        self.size = max(1, size)
+        self.recycle_after = max(1, recycle_after)
+        self._authkey = os.urandom(16)
+        self._listener = None
+        self._idle = queue.Queue()
+        self._starting = {}  # pid -> _Worker, until it connected
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self):
+        """Opens the socket and starts the workers; they warm up in the background."""
+        self._listener = Listener(authkey=self._authkey)
+        threading.Thread(target=self._accept_loop, name="robot-pool-accept", daemon=True).start()
+        for _ in range(self.size):
+            self._spawn()
+        return self
+
+    def run(self, command, args, env=None, on_output=None):
+        """
+        Runs `robot` or `rebot` (command) with CLI `args` on the next free
+        worker. Console output goes to on_output(text) line by line, or is
+        buffered for PooledRun.read().
+        """
+        return PooledRun(self, command, list(args), dict(env or {}), on_output)
+
+    def free(self):
+        """Workers ready to take a run right now."""
+        return self._idle.qsize()
+
+    def close(self):
+        """Stops the idle and warming workers; busy ones stop when their run ends."""
+        with self._lock:
+            self._closed = True
+            workers = list(self._starting.values())
+        while True:
+            try:
+                workers.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for worker in workers:
+            self._retire(worker)
+        if self._listener is not None:
+            self._listener.close()
+
+    # --- INTERNALS ---
+
+    def _spawn(self):
+        env = {**os.environ, AUTHKEY_ENV: self._authkey.hex()}
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "backend.worker_pool", self._listener.address, str(self.recycle_after)],
+            cwd=self.base_dir,
+            env=env,
+        )
+        with self._lock:
+            self._starting[proc.pid] = _Worker(proc)
+
+    def _accept_loop(self):
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                if self._closed:
+                    return
+                continue
+            except Exception:
+                continue  # failed authentication
+            # A worker says "ready" only after its preload; others may connect meanwhile
+            threading.Thread(target=self._handshake, args=(conn,), name="robot-pool-handshake", daemon=True).start()
+
+    def _handshake(self, conn):
+        try:
+            _, pid = conn.recv()
+        except Exception:
+            conn.close()  # a worker that died while warming up
+            return
+        with self._lock:
+            worker = self._starting.pop(pid, None)
+            if worker is not None and not self._closed:
+                worker.conn = conn
+                self._idle.put(worker)
+                return
+        conn.close()
+
+    def _acquire(self):
+        """Next live worker; raises PoolError after START_TIMEOUT."""
+        while True:
+            try:
+                worker = self._idle.get(timeout=START_TIMEOUT)
+            except queue.Empty:
+                raise PoolError(f"no worker ready within {START_TIMEOUT:.0f}s")
+            if worker.proc.poll() is None:
+                return worker
+            self._replace(worker)
+
+    def _release(self, worker):
+        worker.runs += 1
+        if self._closed or worker.runs >= self.recycle_after or worker.proc.poll() is not None:
+            self._replace(worker)
+        else:
+            self._idle.put(worker)
+
+    def _replace(self, worker):
+        self._retire(worker)
+        if not self._closed:
+            self._spawn()
+
+    def _retire(self, worker):
+        if worker.conn is not None:
+            worker.conn.close()
+        else:
+            worker.proc.terminate()  # still warming up
+        # A worker exits by itself after its last run or when its socket closes
+        try:
+            worker.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            worker.proc.kill()
+            worker.proc.wait()
+
+
+class PooledRun:
+    """
+    One run on a pool worker, with the parts of the Popen interface the
+    runners use: poll(), wait(), terminate() and a non-blocking read().
+    """
+
+    def __init__(self, pool, command, args, env, on_output):
+        self.returncode = None
+        self.error = None
+        self._pool = pool
+        self._request = {"command": command, "args": args, "env": env}
+        self._on_output = on_output
+        self._output = []
+        self._lock = threading.Lock()
+        self._worker = None
+        self._terminated = False
+        self._done = threading.Event()
+        self._callbacks = []
+        threading.Thread(target=self._drive, name="robot-pool-run", daemon=True).start()
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        """Return code; raises PoolError when no worker could take the run."""
+        self._done.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.returncode
+
+    def add_done_callback(self, callback):
+        """Calls callback(run) on the run's thread once it ended (at once if it already has)."""
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def read(self):
+        """Console output since the last read (only without on_output)."""
+        with self._lock:
+            text = "".join(self._output)
+            self._output.clear()
+        return text
+
+    def terminate(self):
+        """Stops the run like SIGTERM stops `robot`; the worker is replaced afterwards."""
+        with self._lock:
+            self._terminated = True
+            worker = self._worker
+        if worker is not None and worker.proc.poll() is None:
+            worker.proc.terminate()
+
+    def _emit(self, text):
+        if self._on_output is not None:
+            self._on_output(text)
+        else:
+            with self._lock:
+                self._output.append(text)
+
+    def _drive(self):
+        try:
+            self.returncode = self._dispatch()
+        except PoolError as e:
+            self._emit(f"⚠️ Worker pool: {e}\n")
+            self.error = e
+            self.returncode = 1
+        finally:
+            with self._lock:
+                self._done.set()
+                callbacks, self._callbacks = self._callbacks, []
+            for callback in callbacks:
+                callback(self)
+
+    def _dispatch(self):
+        while True:
+            worker = self._pool._acquire()
+            with self._lock:
+                if self._terminated:
+                    self._pool._idle.put(worker)
+                    return -signal.SIGTERM
+                self._worker = worker
+            try:
+                worker.conn.send(self._request)
+                message = worker.conn.recv()
+                if message[0] == "stale":
+                    self._pool._replace(worker)
+                    continue
+                while message[0] == "output":
+                    self._emit(message[1])
+                    message = worker.conn.recv()
+            except (EOFError, OSError):
+                # Killed (terminate) or crashed mid-run
+                self._pool._replace(worker)
+                return -signal.SIGTERM if self._terminated else 1
+            if self._terminated:
+                self._pool._replace(worker)
+            else:
+                self._pool._release(worker)
+            return message[1]
+
+
+class ProcessRun:
+    """
+    A `robot`/`rebot` CLI process behind PooledRun's interface, for callers
+    that poll a run and find no free pool worker.
+    """
+
+    def __init__(self, cmd, cwd, env=None):
+        self._output = []
+        self._lock = threading.Lock()
+        self._proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            cwd=cwd,
+            env={**os.environ, **(env or {})},
+            start_new_session=True,
+        )
+        self._reader = threading.Thread(target=self._pump, name="robot-cli-output", daemon=True)
+        self._reader.start()
+
+    @property
+    def returncode(self):
+        return self._proc.returncode
+
+    def poll(self):
+        # Not done until the last line was read, so a final read() gets all of it
+        if self._reader.is_alive():
+            return None
+        return self._proc.poll()
+
+    def wait(self, timeout=None):
+        self._reader.join(timeout)
+        return self._proc.wait(timeout)
+
+    def read(self):
+        with self._lock:
+            text = "".join(self._output)
+            self._output.clear()
+        return text
+
+    def terminate(self):
+        if self._proc.poll() is None:
+            self._proc.terminate()
+
+    def _pump(self):
+        for line in self._proc.stdout:
+            with self._lock:
+                self._output.append(line)
+        self._proc.stdout.close()
+
+
+# --- WORKER (client side) ---
+
+class _ConsoleWriter:
+    """File-like object sending complete console lines to the pool."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._pending = ""
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        with self._lock:
+            lines = (self._pending + text).split("\n")
+            self._pending = lines.pop()
+            for line in lines:
+                self._conn.send(("output", line + "\n"))
+        return len(text)
+
+    def flush(self):
+        # Robot flushes after partial lines ("Test name ... | PASS |"); keep them whole
+        pass
+
+    def close(self):
+        with self._lock:
+            if self._pending:
+                self._conn.send(("output", self._pending))
+                self._pending = ""
+
+    def isatty(self):
+        return False
+
+
+def _preload(base_dir):
+    for name in PRELOAD:
+        importlib.import_module(name)
+    libs_dir = os.path.join(base_dir, "resources", "keywords", "custom-libs")
+    if not os.path.isdir(libs_dir):
+        return
+    # Same directory robot imports them from by path, so it reuses these modules
+    sys.path.insert(0, libs_dir)
+    for file in sorted(os.listdir(libs_dir)):
+        if file.endswith(".py"):
+            try:
+                importlib.import_module(file[:-3])
+            except Exception as e:
+                print(f"⚠️ Worker could not preload {file}: {e}")
+
+
+def _project_files(base_dir):
+    """mtime of every imported module file inside the project."""
+    files = {}
+    prefix = os.path.join(os.path.abspath(base_dir), "")
+    for module in list(sys.modules.values()):
+        path = getattr(module, "__file__", None)
+        if path and os.path.abspath(path).startswith(prefix):
+            with contextlib.suppress(OSError):
+                files[path] = os.stat(path).st_mtime_ns
+    return files
+
+
+def _changed(files):
+    for path, mtime in files.items():
+        try:
+            if os.stat(path).st_mtime_ns != mtime:
+                return True
+        except OSError:
+            return True
+    return False
+
+
+def _execute(conn, request, base_dir):
+    from robot.errors import DataError, Information
+    from robot.rebot import Rebot
+    from robot.run import RobotFramework
+
+    app = RobotFramework() if request["command"] == "robot" else Rebot()
+    writer = _ConsoleWriter(conn)
+    environ = dict(os.environ)
+    os.environ.update(request["env"])
+    metrics = sys.modules.get("_metrics")
+    if metrics is not None:
+        metrics.configure(os.environ.get("ROBOT_METRICS_FILE"))
+    # Log To Console and the console output write to sys.__stdout__, not sys.stdout
+    streams = sys.stdout, sys.stderr, sys.__stdout__, sys.__stderr__
+    sys.stdout = sys.stderr = sys.__stdout__ = sys.__stderr__ = writer
+    try:
+        options, paths = app.parse_arguments(request["args"])
+        return app.execute(*paths, stdout=writer, stderr=writer, **options)
+    except (DataError, Information) as e:
+        writer.write(f"{e}\n")
+        return 252
+    finally:
+        sys.stdout, sys.stderr, sys.__stdout__, sys.__stderr__ = streams
+        writer.close()
+        if metrics is not None:
+            metrics.configure(None)
+        os.environ.clear()
+        os.environ.update(environ)
+        os.chdir(base_dir)
+
+
+def serve(address, recycle_after):
+    base_dir = os.getcwd()
+    conn = Client(address, authkey=bytes.fromhex(os.environ.pop(AUTHKEY_ENV)))
+    _preload(base_dir)
+    files = _project_files(base_dir)
+    conn.send(("ready", os.getpid()))
+    for _ in range(recycle_after):
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            return  # the pool closed the connection
+        if _changed(files):
+            conn.send(("stale",))
+            return
+        code = _execute(conn, request, base_dir)
+        conn.send(("done", code))
+        # Also watch what this run imported (test libraries, resources' modules)
+        files = {**_project_files(base_dir), **files}
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1], int(sys.argv[2]))
@@ -0,0 +1,87 @@
+"""
+Benchmark: ContextBuilder payload rendering throughput.
+
+Builds the generators.py registry + templates in a temp workspace and reports
+payloads/second for:
+  * legacy   - per-item `env.get_template` lookup (pre template-cache behaviour)
+  * cached   - `Build Payload` called once per input_data dict
+  * bulk     - `Build Payloads` over the whole batch (same cost as cached)
+  * loads    - `Build Payload` + `json.loads`, what callers needing a dict do
+  * object   - `Build Payload Object` (structured mode, no re-parse)
+  * json     - `Build Payload Json` (structured mode, serialized once)
+
+Usage:
+    python benchmarks/bench_context_builder.py [--payloads 200] [--items 1000]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'resources', 'keywords', 'custom-libs'))
+
+import generators  # noqa: E402
+from ContextBuilder import ContextBuilder  # noqa: E402
+
+ARGS = (generators.PRODUCT, generators.COMPONENT, generators.COMMAND)
+
+
+def legacy_build_payload(builder, input_data):
+    """Mirror of the original per-item lookup loop, kept for the 'before' number."""
+    registry = builder.registry_cache[f"{generators.PRODUCT}.{generators.COMPONENT}"]
+    cmd_def = registry['commands'][generators.COMMAND]
+    components = registry['components']
+    sections = {}
+    for rules in cmd_def['structure'].values():
+        if rules.get('type') == 'list':
+            rendered_items = []
+            for item_data in input_data[rules['source']]:
+                t = builder.env.get_template(components[rules['item_template']])
+                rendered_items.append(t.render(item=item_data))
+            sections[rules['key']] = "[" + ",".join(rendered_items) + "]"
+        else:
+            sections[rules['key']] = builder.env.get_template(components[rules['template_ref']]).render(**input_data)
+    return builder.env.get_template(cmd_def['template']).render(active_sections=sections, **input_data)
+
+
+def measure(label, fn, count):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<8} {elapsed:8.3f}s  {count / elapsed:10.1f} payloads/s")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--payloads', type=int, default=200)
+    parser.add_argument('--items', type=int, default=1000)
+    args = parser.parse_args()
+
+    inputs = [generators.make_payload_input(args.items, index=p) for p in range(args.payloads)]
+    with tempfile.TemporaryDirectory() as workspace:
+        generators.write_registry(workspace)
+        os.chdir(workspace)
+        builder = ContextBuilder()
+        builder.load_registry(generators.PRODUCT, generators.COMPONENT, generators.VERSION)
+
+        print(f"{args.payloads} payloads x {args.items} list items")
+        before = measure('legacy', lambda: [legacy_build_payload(builder, d) for d in inputs], args.payloads)
+        after = measure('cached', lambda: [builder.build_payload(*ARGS, d) for d in inputs], args.payloads)
+        measure('bulk', lambda: builder.build_payloads(*ARGS, inputs), args.payloads)
+        print(f"speedup  {before / after:8.2f}x")
+
+        build = lambda d: builder.build_payload(*ARGS, d)  # noqa: E731
+        build_object = lambda d: builder.build_payload_object(*ARGS, d)  # noqa: E731
+        assert build_object(inputs[0]) == json.loads(build(inputs[0]))
+        before = measure('loads', lambda: [json.loads(build(d)) for d in inputs], args.payloads)
+        after = measure('object', lambda: [build_object(d) for d in inputs], args.payloads)
+        measure('json', lambda: [builder.build_payload_json(*ARGS, d) for d in inputs], args.payloads)
+        print(f"speedup  {before / after:8.2f}x")
+
+
+if __name__ == '__main__':
+    main()
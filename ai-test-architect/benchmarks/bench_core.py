@@ -0,0 +1,213 @@
+"""
+Benchmark harness for the data-driven hot paths.
+
+Cases:
+  registry_cold / registry_warm   ContextBuilder start + Load Registry, without / with the pickled index
+  payload_text / payload_object   one payload with `items` list entries (text / structured mode)
+  payload_bulk                    Build Payloads (convenience loop) over 100 payloads of items/100 entries
+  yaml_full / yaml_lazy / yaml_cached   DataLoader testdata load (full parse, one key, pickle cache)
+  yaml_compiled                   full parse plus schema validation into columns
+  expand_copy / expand_shared     DataLoader expansion of one test into `scenarios` tests
+  expand_compiled                 shared expansion from the compiled (columnar) scenarios
+
+Every case is timed `--repeat` times (best and median), then run once more
+under tracemalloc for its peak allocation. Results can be stored as a
+baseline (--save) and later runs are compared against it; a case slower or
+bigger than baseline * (1 + threshold) is a regression and exits with 1.
+
+Usage:
+    python benchmarks/bench_core.py [--scale small|medium|large] [--items N] [--scenarios N] [--depth N]
+                                    [--case yaml_] [--save] [--threshold 0.25]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+BASELINE_DIR = os.path.join(BENCH_DIR, 'baselines')
+sys.path.insert(0, os.path.join(ROOT_DIR, 'resources', 'keywords', 'custom-libs'))
+
+import generators  # noqa: E402
+
+SCALES = {
+    'small': {'items': 1000, 'depth': 1, 'tests': 10, 'scenarios': 100, 'steps': 20},
+    'medium': {'items': 10000, 'depth': 3, 'tests': 50, 'scenarios': 1000, 'steps': 20},
+    'large': {'items': 100000, 'depth': 5, 'tests': 100, 'scenarios': 10000, 'steps': 20},
+}
+
+
+def _builder(loaded=True):
+    from ContextBuilder import ContextBuilder
+
+    builder = ContextBuilder()
+    if loaded:
+        builder.load_registry(generators.PRODUCT, generators.COMPONENT, generators.VERSION)
+    return builder
+
+
+def make_cases(workspace, params):
+    """name -> prepare(); prepare() does the untimed setup and returns the timed callable."""
+    from DataLoader import DataLoader, compile_testdata
+
+    args = (generators.PRODUCT, generators.COMPONENT, generators.COMMAND)
+    payload = generators.make_payload_input(params['items'], params['depth'])
+    batch = [generators.make_payload_input(max(1, params['items'] // 100), params['depth'], i) for i in range(100)]
+    _, yaml_path = generators.write_testdata(workspace, params['tests'], params['scenarios'], params['depth'])
+    test_names = [f"Bench Test {t}" for t in range(params['tests'])]
+    testdata = generators.make_testdata(1, params['scenarios'], params['depth'])
+    compiled = compile_testdata(testdata, yaml_path)
+    cache_dir = os.path.join(workspace, '.cache')
+
+    def registry(cold):
+        def prepare():
+            if cold:
+                shutil.rmtree(os.path.join(cache_dir, 'registry'), ignore_errors=True)
+            return lambda: _builder()
+        return prepare
+
+    def render(method, data):
+        def prepare():
+            builder = _builder()
+            return lambda: getattr(builder, method)(*args, data)
+        return prepare
+
+    def load(**options):
+        def prepare():
+            loader = DataLoader(**options)
+            stat = os.stat(yaml_path)
+            names = test_names[:1] if options.get('lazy') else test_names
+            if options.get('cache'):
+                loader._load_data(yaml_path, stat, names)  # warm the pickle
+            return lambda: loader._load_data(yaml_path, stat, names)
+        return prepare
+
+    def expand(mode, compiled=False):
+        config = (compiled if compiled else testdata)['Bench Test 0']
+
+        def prepare():
+            loader = DataLoader(cache=False, expansion=mode, compiled=bool(compiled))
+            suite = generators.build_template_suite(params['steps'])
+            return lambda: loader._expand_test_case(suite, suite.tests[0], config)
+        return prepare
+
+    return {
+        'registry_cold': registry(cold=True),
+        'registry_warm': registry(cold=False),
+        'payload_text': render('build_payload', payload),
+        'payload_object': render('build_payload_object', payload),
+        'payload_bulk': render('build_payloads', batch),
+        'yaml_full': load(cache=False),
+        'yaml_lazy': load(cache=False, lazy=True),
+        'yaml_cached': load(cache=True),
+        'yaml_compiled': load(cache=False, compiled=True),
+        'expand_copy': expand('copy'),
+        'expand_shared': expand('shared'),
+        'expand_compiled': expand('shared', compiled),
+    }
+
+
+def measure(prepare, repeat):
+    times = []
+    for _ in range(repeat):
+        run = prepare()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    run = prepare()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'best_ms': min(times) * 1000, 'median_ms': statistics.median(times) * 1000, 'peak_mb': peak / 2**20}
+
+
+def compare(result, baseline, threshold):
+    """Returns (time change, memory change, regressed)."""
+    if not baseline:
+        return None, None, False
+    time_change = result['best_ms'] / baseline['best_ms'] - 1 if baseline['best_ms'] else 0.0
+    mem_change = result['peak_mb'] / baseline['peak_mb'] - 1 if baseline['peak_mb'] else 0.0
+    return time_change, mem_change, time_change > threshold or mem_change > threshold
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    for name in ('items', 'depth', 'tests', 'scenarios', 'steps'):
+        parser.add_argument(f"--{name}", type=int)
+    parser.add_argument('--case', default='', help='only run cases whose name contains this')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.25)
+    args = parser.parse_args()
+
+    params = dict(SCALES[args.scale])
+    params.update({k: getattr(args, k) for k in params if getattr(args, k) is not None})
+    baseline_file = os.path.join(BASELINE_DIR, f"{args.scale}.json")
+    baseline = {}
+    if os.path.exists(baseline_file):
+        with open(baseline_file) as f:
+            stored = json.load(f)
+        if stored['params'] == params:
+            baseline = stored['results']
+        elif not args.save:
+            print(f"⚠️ Baseline {baseline_file} was recorded with {stored['params']}, not comparing")
+
+    results = {}
+    regressions = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workspace:
+        generators.write_registry(workspace, params['depth'])
+        os.chdir(workspace)
+        try:
+            print(f"scale {args.scale}: {params}")
+            print(f"{'case':<16} {'best ms':>10} {'median ms':>10} {'peak MB':>9} {'Δ time':>8} {'Δ mem':>8}")
+            for name, prepare in make_cases(workspace, params).items():
+                if args.case not in name:
+                    continue
+                # The libraries log every load; keep that out of the numbers
+                with contextlib.redirect_stdout(io.StringIO()):
+                    result = measure(prepare, args.repeat)
+                results[name] = result
+                time_change, mem_change, regressed = compare(result, baseline.get(name), args.threshold)
+                deltas = (f"{time_change:>+8.0%} {mem_change:>+8.0%}" if time_change is not None else "")
+                flag = "  ❌ regression" if regressed else ""
+                print(f"{name:<16} {result['best_ms']:>10.2f} {result['median_ms']:>10.2f} "
+                      f"{result['peak_mb']:>9.2f} {deltas}{flag}")
+                if regressed:
+                    regressions.append(name)
+        finally:
+            os.chdir(cwd)
+
+    if args.save:
+        # A --case run only replaces the cases it measured
+        results = {**baseline, **results}
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_file, 'w') as f:
+            json.dump({
+                'params': params,
+                'python': platform.python_version(),
+                'recorded': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'results': results,
+            }, f, indent=2)
+        print(f"Baseline saved to {baseline_file}")
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Benchmark: DataLoader scenario expansion (build time and RSS).
+
+Expands one template test into N scenarios in 'copy' (deepcopy per
+scenario) and 'shared' (template body reused) mode. Every measurement runs
+in a fresh interpreter so the RSS numbers do not leak between cases.
+
+Usage:
+    python benchmarks/bench_expansion.py [--scenarios 1000 10000 100000] [--steps 20]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'resources', 'keywords', 'custom-libs'))
+
+import generators  # noqa: E402
+
+
+def current_rss_mb():
+    """Resident set size of this process (Linux /proc, falls back to peak RSS)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_case(mode, scenarios, steps):
+    from DataLoader import DataLoader
+
+    suite = generators.build_template_suite(steps, loop=True)
+    config = generators.make_testdata(1, scenarios)['Bench Test 0']
+    loader = DataLoader(expansion=mode, cache=False)
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    loader._expand_test_case(suite, suite.tests[0], config)
+    elapsed = time.perf_counter() - start
+    assert len(suite.tests) == scenarios
+    return {'seconds': elapsed, 'rss_mb': current_rss_mb() - rss_before}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--steps', type=int, default=20)
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'SCENARIOS'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_case(args.child[0], int(args.child[1]), args.steps)))
+        return
+
+    print(f"{'scenarios':>10} {'mode':>7} {'build s':>9} {'tests/s':>10} {'RSS +MB':>9}")
+    for scenarios in args.scenarios:
+        for mode in ('copy', 'shared'):
+            out = subprocess.run(
+                [sys.executable, __file__, '--steps', str(args.steps), '--child', mode, str(scenarios)],
+                capture_output=True, text=True, check=True,
+            )
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{scenarios:>10} {mode:>7} {result['seconds']:>9.3f} "
+                  f"{scenarios / result['seconds']:>10.0f} {result['rss_mb']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
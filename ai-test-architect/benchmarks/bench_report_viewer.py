@@ -0,0 +1,106 @@
+"""
+Benchmark: RSS of the report viewer as report.html grows.
+
+Runs a generated suite of N tests (every 10th fails) once per size, then
+measures in a fresh interpreter what the viewer holds per rerun:
+  'inline'  the old viewer: report.html read into a str, encoded again for
+            st.download_button and passed to components.html
+  'summary' the new viewer: run summary + one page of failures from the
+            run history, the report itself is only referenced by URL
+
+Usage:
+    python benchmarks/bench_report_viewer.py [--tests 1000 5000 20000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+PAGE_SIZE = 20
+
+
+def current_rss_mb():
+    """Resident set size of this process (Linux /proc, falls back to peak RSS)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_suite(path, tests):
+    with open(path, 'w') as f:
+        f.write('*** Test Cases ***\n')
+        for i in range(tests):
+            f.write(f"Test {i}\n    Log    step one of test {i}\n    Log    step two of test {i}\n")
+            if i % 10 == 0:
+                f.write(f"    Fail    expected failure {i}\n")
+
+
+def make_run(workdir, tests):
+    """Executes the suite and records it in the run history. Returns the run directory."""
+    from backend.results_store import ResultsStore
+
+    suite = os.path.join(workdir, f"bench_{tests}.robot")
+    run_dir = os.path.join(workdir, 'results', str(tests))
+    write_suite(suite, tests)
+    subprocess.run(
+        ['robot', '--outputdir', run_dir, '--console', 'none', suite],
+        cwd=workdir, check=False,
+    )
+    ResultsStore(os.path.join(workdir, 'results')).ingest(str(tests), os.path.join(run_dir, 'output.xml'))
+    return run_dir
+
+
+def view(mode, workdir, run_id):
+    run_dir = os.path.join(workdir, 'results', run_id)
+    rss_before = current_rss_mb()
+    if mode == 'inline':
+        with open(os.path.join(run_dir, 'report.html'), 'r', encoding='utf-8') as f:
+            report_html = f.read()
+        download = report_html.encode('utf-8')  # st.download_button payload
+        embedded = json.dumps({'html': report_html})  # components.html delta message
+        held = len(download) + len(embedded)
+    else:
+        from backend.results_store import ResultsStore
+
+        store = ResultsStore(os.path.join(workdir, 'results'))
+        rss_before = current_rss_mb()
+        summary = store.run(run_id)
+        failures = store.tests(run_id, 'FAIL', PAGE_SIZE, 0)
+        held = len(json.dumps([summary, failures]))
+    return {'rss_mb': current_rss_mb() - rss_before, 'held_mb': held / 2**20}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tests', type=int, nargs='+', default=[1000, 5000, 20000])
+    parser.add_argument('--child', nargs=3, metavar=('MODE', 'WORKDIR', 'RUN_ID'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(view(*args.child)))
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"{'tests':>7} {'report MB':>10} {'mode':>8} {'RSS +MB':>9} {'held MB':>9}")
+        for tests in args.tests:
+            run_dir = make_run(workdir, tests)
+            size = os.path.getsize(os.path.join(run_dir, 'report.html')) / 2**20
+            for mode in ('inline', 'summary'):
+                out = subprocess.run(
+                    [sys.executable, __file__, '--child', mode, workdir, str(tests)],
+                    capture_output=True, text=True, check=True,
+                )
+                result = json.loads(out.stdout.strip().splitlines()[-1])
+                print(f"{tests:>7} {size:>10.1f} {mode:>8} {result['rss_mb']:>9.1f} {result['held_mb']:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
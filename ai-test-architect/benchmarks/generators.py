@@ -0,0 +1,131 @@
+"""
+Synthetic workspaces for the benchmarks: registries, templates and
+DataLoader testdata at configurable scale.
+
+  items      list entries per payload (one fragment render each)
+  depth      nesting depth of every list item / scenario variable
+  tests      template tests per testdata YAML
+  scenarios  scenarios per template test
+"""
+import os
+
+import yaml
+
+PRODUCT, COMPONENT, VERSION, COMMAND = 'BenchApp', 'Order', 'v1.0', 'Create_Order'
+
+
+def _nested(depth, leaf):
+    node = leaf
+    for level in reversed(range(depth)):
+        node = {f"level{level}": node}
+    return node
+
+
+def _nested_template(depth, leaf):
+    """JSON text of `_nested` with a Jinja expression at the leaf."""
+    path = 'item' + ''.join(f".level{level}" for level in range(depth))
+    text = leaf.replace('ITEM', path)
+    for level in reversed(range(depth)):
+        text = f'{{"level{level}": {text}}}'
+    return text
+
+
+def write_registry(root, depth=1):
+    """Registry + templates under root/resources. Returns the registry dict."""
+    registry = {
+        'components': {'Order_Line': 'fragments/order_line.j2', 'Customer': 'fragments/customer.j2'},
+        'commands': {
+            COMMAND: {
+                'inputs': {'required': ['order_id', 'customer_name', 'lines']},
+                'template': f"{PRODUCT}/{COMPONENT}/create_order.j2",
+                'structure': {
+                    'customer': {'key': 'customer', 'template_ref': 'Customer'},
+                    'lines': {'key': 'orderLines', 'type': 'list', 'source': 'lines', 'item_template': 'Order_Line'},
+                },
+            },
+        },
+    }
+    templates = {
+        'fragments/order_line.j2': _nested_template(
+            depth, '{"sku": "{{ ITEM.sku }}", "quantity": {{ ITEM.quantity }}, "price": {{ ITEM.price }}}'
+        ),
+        'fragments/customer.j2': '{"name": "{{ customer_name }}"}',
+        f"{PRODUCT}/{COMPONENT}/create_order.j2":
+            '{"id": "{{ order_id }}", "customer": {{ active_sections.customer }}, '
+            '"orderLines": {{ active_sections.orderLines | default("[]") }}}',
+    }
+    registry_dir = os.path.join(root, 'resources', 'registry', PRODUCT, COMPONENT)
+    os.makedirs(registry_dir, exist_ok=True)
+    with open(os.path.join(registry_dir, f"{VERSION}.yaml"), 'w') as f:
+        yaml.safe_dump(registry, f)
+    for name, body in templates.items():
+        path = os.path.join(root, 'resources', 'templates', name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(body)
+    return registry
+
+
+def make_payload_input(items, depth=1, index=0):
+    return {
+        'order_id': f"ORD-{index:06d}",
+        'customer_name': f"Customer {index}",
+        'lines': [
+            _nested(depth, {'sku': f"SKU-{i:06d}", 'quantity': i % 7 + 1, 'price': round(i * 1.25, 2)})
+            for i in range(items)
+        ],
+    }
+
+
+def make_testdata(tests, scenarios, depth=1):
+    """DataLoader testdata: {test name: {'TestScenarios': [...]}}."""
+    return {
+        f"Bench Test {t}": {
+            'TestRunSettings': {'Documentation': f"Generated test {t}"},
+            'TestScenarios': [
+                {
+                    'ScenarioVars': {
+                        'user_type': 'ADMIN' if s % 2 else 'USER',
+                        'log_message': f"scenario {s} of test {t}",
+                        'amount': s,
+                        'details': _nested(depth, {'id': s, 'tags': ['a', 'b']}),
+                    },
+                    'RunSettings': {'IterationName': f"iter_{s}"},
+                }
+                for s in range(scenarios)
+            ],
+        }
+        for t in range(tests)
+    }
+
+
+def write_testdata(root, tests, scenarios, depth=1, env_name='UAT', suite='bench/suite'):
+    """Writes testcases/<suite>.robot and its testdata YAML. Returns (robot path, yaml path)."""
+    robot_path = os.path.join(root, 'testcases', f"{suite}.robot")
+    yaml_path = os.path.join(root, 'resources', 'config', 'testdata', env_name, f"{suite}.yaml")
+    os.makedirs(os.path.dirname(robot_path), exist_ok=True)
+    os.makedirs(os.path.dirname(yaml_path), exist_ok=True)
+    with open(yaml_path, 'w') as f:
+        yaml.safe_dump(make_testdata(tests, scenarios, depth), f, sort_keys=False)
+    with open(robot_path, 'w') as f:
+        f.write('*** Test Cases ***\n')
+        for t in range(tests):
+            f.write(f"Bench Test {t}\n    Log    ${{user_type}} ${{log_message}}\n    Log    ${{amount}}\n")
+    return robot_path, yaml_path
+
+
+def build_template_suite(steps=20, loop=False):
+    """
+    In-memory suite with one template test of `steps` keywords, as DataLoader
+    sees it. With `loop`, the test also ends in a FOR loop.
+    """
+    from robot.running import TestSuite
+
+    suite = TestSuite(name='Bench', source='bench.robot')
+    test = suite.tests.create(name='Template Test', tags=['bench'])
+    for i in range(steps):
+        test.body.create_keyword('Log', args=(f"step {i}: ${{user_type}} ${{log_message}}",))
+    if loop:
+        for_loop = test.body.create_for(assign=['${i}'], flavor='IN RANGE', values=['3'])
+        for_loop.body.create_keyword('Log', args=('${i}',))
+    return suite
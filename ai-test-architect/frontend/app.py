@@ -1,9 +1,15 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import requests
 import time
+from stream_parser import ActionStreamParser
 
 # Connect to the Backend running on port 8000
 API_URL = "http://localhost:8000"
+# Console keeps only the tail of the log; the backend holds the rest
+CONSOLE_MAX_CHARS = 200_000
+# Failed tests shown per page in the run summary
+FAILURES_PAGE_SIZE = 20
 
 st.set_page_config(page_title="AI Test Architect", layout="wide", page_icon="🐧")
 st.title("🐧 AI Test Architect (Modular)")
@@ -23,6 +29,8 @@ def post(endpoint, data):
         response = requests.post(f"{API_URL}/{endpoint}", json=data)
         if response.status_code == 200:
             return response.json()
+        if response.status_code == 429: # Run queue full, the backend says when to retry
+            st.warning(f"⏳ {response.json()['detail']}, retry in {response.headers.get('Retry-After', '?')}s")
     except Exception: 
         return None
     return None
@@ -36,30 +44,77 @@ with st.sidebar:
     data = get("files")
     if data:
         for f in data.get("files", []):
-            col1, col2 = st.columns([0.8, 0.2])
+            col1, col2, col3 = st.columns([0.7, 0.15, 0.15])
             col1.code(f, language="text")
-            # 2. Button triggers a run on the Backend
-            if col2.button("▶️", key=f):
-                post(f"run/{f}", {})
-                st.toast(f"Request sent: {f}")
+            # 2. Buttons trigger a full / affected-only run on the Backend
+            if col2.button("▶️", key=f, help="Run all tests"):
+                job = post(f"run/{f}", {})
+                if job:
+                    st.toast(f"Job {job.get('job_id')} {job.get('status')}: {f}")
+            if col3.button("🎯", key=f"{f}-affected", help="Run only tests affected by changes"):
+                job = post(f"run/{f}?affected=true", {})
+                if job:
+                    st.toast(f"Job {job.get('job_id')} {job.get('status')} (affected only): {f}")
 
     st.divider()
     st.header("⚙️ Console")
     
-    # 3. Poll Backend for Status
-    state = get("status")
+    # 3. Poll Backend for Status (only the log lines after our cursor)
+    if "console" not in st.session_state:
+        st.session_state.console = {"job_id": None, "cursor": 0, "logs": ""}
+    console = st.session_state.console
+
+    state = get(f"status?cursor={console['cursor']}")
+    if state and state.get("job_id") != console["job_id"]:
+        # A new job started: restart the console from its first line
+        console.update(job_id=state.get("job_id"), cursor=0, logs="")
+        state = get("status?cursor=0")
     if state:
-        logs = state.get("logs", "")
+        console["logs"] = (console["logs"] + state.get("logs", ""))[-CONSOLE_MAX_CHARS:]
+        console["cursor"] = state.get("cursor", console["cursor"])
         status = state.get("status", "idle")
         
-        st.text_area("Live Output", logs, height=300)
+        st.text_area("Live Output", console["logs"], height=300)
         
-        if status == "running":
-            st.info("Test Running...")
+        if status in ("queued", "running"):
+            st.info("Waiting in the run queue..." if status == "queued" else "Test Running...")
+            if st.button("🛑 Abort"):
+                post(f"jobs/{console['job_id']}/abort", {})
             time.sleep(1) # Wait 1s
             st.rerun()    # Refresh UI automatically
         elif status == "finished":
             st.success("Finished!")
+        elif status == "aborted":
+            st.warning("Aborted.")
+
+# --- REPORT VIEWER ---
+# Reports are served by the backend; the browser fetches them by URL and
+# this process only ever holds one page of the failure summary.
+job_id = st.session_state.console["job_id"]
+job = get(f"jobs/{job_id}") if job_id else None
+if job and job.get("status") in ("finished", "aborted") and job.get("report_url"):
+    st.divider()
+    st.subheader("📊 Test Report")
+    run = get(f"history/runs/{job_id}?limit=0") or {}
+    if run:
+        st.caption(f"✅ {run['passed']} passed · ❌ {run['failed']} failed · ⏭️ {run['skipped']} skipped")
+    col1, col2 = st.columns(2)
+    col1.link_button("📄 Open Report", f"{API_URL}{job['report_url']}")
+    if job.get("log_url"):
+        col2.link_button("📜 Open Log", f"{API_URL}{job['log_url']}")
+
+    if run.get("failed"):
+        pages = (run["failed"] - 1) // FAILURES_PAGE_SIZE + 1
+        page = st.number_input("Failures page", 1, pages, 1) if pages > 1 else 1
+        failures = get(f"history/runs/{job_id}?status=FAIL&limit={FAILURES_PAGE_SIZE}"
+                       f"&offset={(page - 1) * FAILURES_PAGE_SIZE}") or {}
+        for test in failures.get("tests", []):
+            with st.expander(f"❌ {test['full_name']} ({test['elapsed'] or 0:.2f}s)"):
+                st.code(test["message"] or "(no message)", language="text")
+
+    if st.toggle("Embed report"):
+        components.iframe(f"{API_URL}{job['report_url']}", height=600, scrolling=True)
+    st.divider()
 
 # --- MAIN CHAT INTERFACE ---
 if "messages" not in st.session_state:
@@ -75,33 +130,42 @@ if prompt := st.chat_input("Ex: Write a login test"):
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    with st.spinner("Backend Processing..."):
-        # 2. Send Message to Backend
-        res = post("chat", {"messages": st.session_state.messages})
-        
-        if res:
-            content = res.get("content", "Error: No content from backend")
-            
-            # 3. Handle Commands (Client-side actions)
-            if "```robot" in content:
-                # Extract code and save via API
-                try:
-                    code = content.split("```robot")[1].split("```")[0].strip()
-                    filename = "generated.robot"
-                    for line in content.split('\n'):
-                        if "File:" in line: filename = line.split("File:")[1].strip()
-                    
-                    post("files", {"filename": filename, "content": code})
-                    st.success(f"Saved {filename} to Backend")
-                except:
-                    pass
-
-            if "ACTION: RUN" in content:
-                f = content.split("ACTION: RUN")[1].strip()
-                post(f"run/{f}", {})
-                st.rerun()
-
-            st.markdown(content)
-            st.session_state.messages.append({"role": "assistant", "content": content})
-        else:
-            st.error("❌ Could not connect to Backend (is it running on port 8000?)")
\ No newline at end of file
+    # 2. Stream the answer from the Backend; actions fire as soon as they are complete
+    parser = ActionStreamParser()
+    notices = []
+    started_runs = []
+    usage = {}
+
+    def handle(action):
+        if action[0] == "write":
+            _, filename, code = action
+            if post("files", {"filename": filename, "content": code}):
+                notices.append(f"Saved {filename} to Backend")
+        elif action[0] == "run":
+            if post(f"run/{action[1]}", {}):
+                started_runs.append(action[1])
+
+    def tokens():
+        with requests.post(f"{API_URL}/chat/stream", json={"messages": st.session_state.messages}, stream=True) as r:
+            r.raise_for_status()
+            usage.update({k[len("x-usage-"):]: v for k, v in r.headers.items() if k.lower().startswith("x-usage-")})
+            for chunk in r.iter_content(chunk_size=None, decode_unicode=True):
+                for action in parser.feed(chunk):
+                    handle(action)
+                yield chunk
+        for action in parser.close():
+            handle(action)
+
+    try:
+        with st.chat_message("assistant"):
+            content = st.write_stream(tokens())
+            for notice in notices:
+                st.success(notice)
+            if usage:
+                st.caption(f"🧮 {usage.get('prompt-tokens')} prompt tokens · "
+                           f"{usage.get('turns-sent')} turns sent · {usage.get('turns-summarized')} summarized")
+        st.session_state.messages.append({"role": "assistant", "content": content})
+        if started_runs:
+            st.rerun()
+    except requests.RequestException:
+        st.error("❌ Could not connect to Backend (is it running on port 8000?)")
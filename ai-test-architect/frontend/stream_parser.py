@@ -0,0 +1,55 @@
+class ActionStreamParser:
+    """
+    Incremental parser for the agent's tool syntax.
+
+    Feed it the response chunk by chunk; it returns actions as soon as they
+    are complete instead of waiting for the whole completion:
+      ("write", filename, code)  when a ```robot block closes
+      ("run", filename)          when an "ACTION: RUN <file>" line ends
+      ("read", filename)         when an "ACTION: READ <file>" line ends
+    """
+
+    def __init__(self, default_filename="generated.robot"):
+        self.default_filename = default_filename
+        self.filename = None
+        self._partial = ""
+        self._code = None  # lines of the open ```robot block, None outside a block
+
+    def feed(self, chunk):
+        self._partial += chunk
+        *lines, self._partial = self._partial.split("\n")
+        actions = []
+        for line in lines:
+            actions.extend(self._parse_line(line))
+        return actions
+
+    def close(self):
+        """Flushes the last (unterminated) line at the end of the stream."""
+        line, self._partial = self._partial, ""
+        return self._parse_line(line) if line else []
+
+    def _parse_line(self, line):
+        if self._code is not None:
+            if "```" in line:
+                self._code.append(line.split("```")[0])
+                code = "\n".join(self._code).strip()
+                self._code = None
+                return [("write", self.filename or self.default_filename, code)]
+            self._code.append(line)
+            return []
+
+        if "```robot" in line:
+            self._code = []
+            rest = line.split("```robot", 1)[1]
+            return self._parse_line(rest) if rest.strip() else []
+        if "File:" in line:
+            parts = line.split("File:", 1)[1].strip().split()
+            if parts:
+                self.filename = parts[0]
+            return []
+        for marker, action in (("ACTION: RUN", "run"), ("ACTION: READ", "read")):
+            if marker in line:
+                parts = line.split(marker, 1)[1].strip().split()
+                if parts:
+                    return [(action, parts[0])]
+        return []
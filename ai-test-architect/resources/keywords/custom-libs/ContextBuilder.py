@@ -1,8 +1,447 @@
 import os
+import re
+import json
+import math
 import yaml
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from jinja2 import Environment, FileSystemLoader, TemplateError, select_autoescape
 from robot.api.deco import keyword, library
 
+from _cache import load_pickle, save_pickle
+from _metrics import timed
+from _schema import locate
+
+# Prefer the libyaml-backed loader, it parses several times faster
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# Optional: orjson parses/serializes structured payloads faster, and its key
+# cache shares the dict keys of all list items instead of one copy per item
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    orjson = None
+    _loads = json.loads
+
+# Placeholder passed to the master template for each section in structured mode.
+# It renders as a JSON string and is swapped for the section's object afterwards.
+_SECTION_SENTINEL = "\x00section:"
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def dump_json(payload):
+    """Serializes a structured payload once, to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return _ENCODER.encode(payload).encode('utf-8')
+
+
+def write_json(payload, fp):
+    """
+    Streams a structured payload to a binary file-like object (file, socket
+    makefile, ...) without building the whole JSON text first.
+    """
+    if orjson is not None:
+        _write_orjson(payload, fp, depth=2)
+        return
+    for chunk in _ENCODER.iterencode(payload):
+        fp.write(chunk.encode('utf-8'))
+
+
+def _write_orjson(node, fp, depth):
+    """orjson output member by member, `depth` container levels down (e.g. per list item)."""
+    if depth and isinstance(node, dict):
+        fp.write(b'{')
+        for index, (key, value) in enumerate(node.items()):
+            fp.write(b'%s%s:' % (b',' if index else b'', orjson.dumps(key)))
+            _write_orjson(value, fp, depth - 1)
+        fp.write(b'}')
+    elif depth and isinstance(node, list):
+        fp.write(b'[')
+        for index, value in enumerate(node):
+            if index:
+                fp.write(b',')
+            _write_orjson(value, fp, depth - 1)
+        fp.write(b']')
+    else:
+        fp.write(orjson.dumps(node))
+
+
+# `{{ expression }}` in a fragment template; statements/comments are not compiled
+_EXPRESSION = re.compile(r"\{\{-?(.*?)-?\}\}", re.S)
+# Slot marker in the parsed fragment skeleton (private-use code points, valid JSON text)
+_SLOT = re.compile("\ue000(\\d+)\ue001")
+# `name.attr.attr`, resolved directly with Environment.getattr like Jinja does
+_PATH = re.compile(r"[A-Za-z_]\w*(?:\.[A-Za-z_]\w*)*")
+_LITERALS = {'true', 'false', 'none', 'True', 'False', 'None'}
+# Characters that JSON text would unescape or reject inside a string
+_JSON_SPECIAL = re.compile(r'["\\\x00-\x1f]')
+
+
+class _Fallback(Exception):
+    """A value that only the text render + parse path reproduces exactly."""
+
+
+def _text(value):
+    """A `{{ expression }}` inside a JSON string, as the text render would decode it."""
+    text = str(value)
+    if _JSON_SPECIAL.search(text):
+        raise _Fallback
+    return text
+
+
+def _value(value):
+    """A bare `{{ expression }}`, i.e. a whole JSON value."""
+    if type(value) is int or (type(value) is float and math.isfinite(value)):
+        return value
+    try:
+        return _loads(str(value))
+    except ValueError:
+        raise _Fallback from None  # e.g. several values ("1,2") in a list
+
+
+def _in_string(literal, inside):
+    """Whether the JSON text is inside a string literal after `literal`."""
+    escaped = False
+    for char in literal:
+        if escaped:
+            escaped = False
+        elif inside and char == '\\':
+            escaped = True
+        elif char == '"':
+            inside = not inside
+    return inside
+
+
+class ObjectTemplate:
+    """
+    A JSON fragment template for structured mode, building Python objects
+    without rendering JSON text and parsing it back.
+
+    At load time the template's `{{ expressions }}` are replaced by slots, the
+    rest is parsed as JSON once and turned into a constructor expression.
+    Plain `name.attr` lookups are inlined into it (with Jinja's getattr and
+    undefined rules), other expressions are compiled by Jinja. Templates with statements ({% %}), autoescaping or a layout the
+    slots cannot express, and values that need JSON unescaping, take the
+    render + parse path, so the result always equals json.loads(render()).
+    """
+    __slots__ = ('template', '_construct')
+
+    def __init__(self, template):
+        self.template = template
+        self._construct = None
+        try:
+            self._compile(template)
+        except Exception:
+            self._construct = None
+
+    def __call__(self, **context):
+        if self._construct is not None:
+            try:
+                return self._construct(context)
+            except _Fallback:
+                pass
+        return _loads(self.template.render(**context))
+
+    def _compile(self, template):
+        env = template.environment
+        source = env.loader.get_source(env, template.name)[0]
+        autoescape = env.autoescape(template.name) if callable(env.autoescape) else env.autoescape
+        # Whitespace control ({{- -}}) could trim text inside JSON strings
+        if autoescape or any(token in source for token in ('{%', '{#', '{{-', '-}}')):
+            return
+
+        parts, expressions, bare, inside, pos = [], [], set(), False, 0
+        for match in _EXPRESSION.finditer(source):
+            literal = source[pos:match.start()]
+            inside = _in_string(literal, inside)
+            slot = f"\ue000{len(expressions)}\ue001"
+            if not inside:
+                bare.add(str(len(expressions)))
+                slot = f'"{slot}"'
+            parts.extend((literal, slot))
+            expressions.append(match.group(1).strip())
+            pos = match.end()
+        parts.append(source[pos:])
+        skeleton = json.loads("".join(parts))
+
+        compiled, values = [], []
+        for expression in expressions:
+            if _PATH.fullmatch(expression) and expression.split('.')[0] not in _LITERALS:
+                root, *attributes = expression.split('.')
+                code = f"_r(x, {root!r})"
+                for attribute in attributes:
+                    code = f"_g({code}, {attribute!r})"
+            else:
+                compiled.append(env.compile_expression(expression, undefined_to_none=False))
+                code = f"e[{len(compiled) - 1}](**x)"
+            values.append(code)
+
+        def resolve(context, name):
+            if name in context:
+                return context[name]
+            if name in env.globals:
+                return env.globals[name]
+            return env.undefined(name=name)
+
+        constants = []
+        code = self._code(skeleton, constants, bare, values)
+        self._construct = eval(  # noqa: S307 - generated from the parsed skeleton only
+            f"lambda x: {code}",
+            {'c': constants, 'e': compiled, '_r': resolve, '_g': env.getattr, '_text': _text, '_value': _value},
+        )
+
+    def _code(self, node, constants, bare, values):
+        """Python expression building `node`; values[i] is the code of slot i."""
+        if isinstance(node, dict):
+            items = []
+            for key, value in node.items():
+                if _SLOT.search(key):
+                    raise ValueError("expression in a key")
+                items.append(f"{self._const(key, constants)}: {self._code(value, constants, bare, values)}")
+            return "{" + ", ".join(items) + "}"
+        if isinstance(node, list):
+            return "[" + ", ".join(self._code(value, constants, bare, values) for value in node) + "]"
+        if isinstance(node, str) and _SLOT.search(node):
+            pieces = _SLOT.split(node)
+            if len(pieces) == 3 and pieces[1] in bare:
+                if pieces[0] or pieces[2]:
+                    raise ValueError("bare expression next to text")
+                return f"_value({values[int(pieces[1])]})"
+            code = []
+            for index, piece in enumerate(pieces):
+                if index % 2:
+                    if piece in bare:
+                        raise ValueError("bare expression inside a string")
+                    code.append(f"_text({values[int(piece)]})")
+                elif piece:
+                    code.append(self._const(piece, constants))
+            if len(code) == 1:
+                return code[0]
+            return "''.join((" + ", ".join(code) + "))"
+        return self._const(node, constants)
+
+    @staticmethod
+    def _const(value, constants):
+        constants.append(value)
+        return f"c[{len(constants) - 1}]"
+
+def _fill_sections(node, sections):
+    """Replaces the section placeholders in the parsed master skeleton, in place."""
+    if isinstance(node, str):
+        if node.startswith(_SECTION_SENTINEL):
+            return sections[node[len(_SECTION_SENTINEL):]]
+        return node
+    if isinstance(node, dict):
+        for key, value in node.items():
+            node[key] = _fill_sections(value, sections)
+    elif isinstance(node, list):
+        for index, value in enumerate(node):
+            node[index] = _fill_sections(value, sections)
+    return node
+
+
+def _version_key(version):
+    """Natural sort: v2.9 < v2.12."""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', version)]
+
+
+class RegistryIndex:
+    """
+    Index of resources/registry/<product>/<component>/<version>.yaml.
+
+    The parsed registries are pickled to .cache/registry/index.pickle together
+    with each file's mtime and size, so every process (e.g. parallel robot
+    workers) attaches to the pickle instead of re-parsing the YAML. Files
+    whose mtime/size changed are re-parsed and the pickle is rewritten.
+    A file that cannot be parsed is indexed as broken and only fails get().
+    """
+
+    def __init__(self, root_dir):
+        self.registry_dir = os.path.join(root_dir, 'resources', 'registry')
+        self.cache_file = os.path.join(root_dir, '.cache', 'registry', 'index.pickle')
+        self.files = {}       # (product, component, version) -> (mtime_ns, size)
+        self.registries = {}  # (product, component, version) -> parsed registry
+        self.errors = {}      # (product, component, version) -> why it could not be parsed
+
+    def load(self):
+        """Attaches to the pickled index and re-parses only stale files."""
+        cached = load_pickle(self.cache_file)
+        try:
+            self.files, self.registries = dict(cached['files']), dict(cached['registries'])
+            self.errors = dict(cached['errors'])
+        except Exception:
+            # missing, or from an older layout
+            self.files, self.registries, self.errors = {}, {}, {}
+
+        current = self._scan()
+        stale = [key for key, stamp in current.items() if self.files.get(key) != stamp]
+        removed = [key for key in self.files if key not in current]
+        for key in stale:
+            self._parse(key, current[key])
+        for key in removed:
+            self.files.pop(key, None)
+            self.registries.pop(key, None)
+            self.errors.pop(key, None)
+        if stale or removed:
+            self._save()
+        return self
+
+    def get(self, product, component, version):
+        """Returns the parsed registry, re-parsing it if the file changed since indexing."""
+        key = (product, component, version)
+        stamp = self._stat(self._path(key))
+        if stamp is None:
+            raise FileNotFoundError(f"Registry not found: {self._path(key)}")
+        if self.files.get(key) != stamp:
+            self._parse(key, stamp)
+            self._save()
+        if key in self.errors:
+            raise RegistrySchemaError(f"❌ Invalid registry {self._path(key)}: {self.errors[key]}")
+        return self.registries[key]
+
+    def path(self, product, component, version):
+        return self._path((product, component, version))
+
+    def versions(self, product, component):
+        found = [v for (p, c, v) in self.files if p == product and c == component]
+        return sorted(found, key=_version_key)
+
+    def _path(self, key):
+        product, component, version = key
+        return os.path.join(self.registry_dir, product, component, f"{version}.yaml")
+
+    def _stat(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _scan(self):
+        found = {}
+        if not os.path.isdir(self.registry_dir):
+            return found
+        for product in os.scandir(self.registry_dir):
+            if not product.is_dir():
+                continue
+            for component in os.scandir(product.path):
+                if not component.is_dir():
+                    continue
+                for entry in os.scandir(component.path):
+                    if entry.name.endswith('.yaml') and entry.is_file():
+                        stat = entry.stat()
+                        key = (product.name, component.name, entry.name[:-len('.yaml')])
+                        found[key] = (stat.st_mtime_ns, stat.st_size)
+        return found
+
+    def _parse(self, key, stamp):
+        try:
+            with open(self._path(key), 'r') as f:
+                self.registries[key] = yaml.load(f, Loader=SafeLoader)
+            self.errors.pop(key, None)
+        except (OSError, yaml.YAMLError) as e:
+            # Only suites that load this registry should fail, not every import
+            self.registries.pop(key, None)
+            self.errors[key] = f"{type(e).__name__}: {e}"
+        self.files[key] = stamp
+
+    def _save(self):
+        save_pickle(self.cache_file, {'files': self.files, 'registries': self.registries, 'errors': self.errors})
+
+
+class RegistrySchemaError(ValueError):
+    """A registry file does not match the expected schema; the message names file and line."""
+
+
+class SectionPlan:
+    """One entry of a command's `structure`, resolved to its template handle."""
+    __slots__ = ('key', 'is_list', 'source', 'omit_if_empty', 'template', 'build')
+
+    def __init__(self, key, is_list, source, omit_if_empty, template):
+        self.key = key
+        self.is_list = is_list
+        self.source = source
+        self.omit_if_empty = omit_if_empty
+        self.template = template
+        self.build = ObjectTemplate(template)  # structured mode
+
+
+class CommandPlan:
+    """
+    A registry command compiled at load time: the required input keys as a
+    frozenset, the master template handle and the sections in structure order.
+    Rendering a payload needs no registry lookups or template resolution.
+    """
+    __slots__ = ('name', 'required', 'required_order', 'template', 'sections')
+
+    def __init__(self, name, required, template, sections):
+        self.name = name
+        self.required_order = tuple(required)
+        self.required = frozenset(required)
+        self.template = template
+        self.sections = tuple(sections)
+
+    def check(self, input_data):
+        """Enforces the 'Input Contract'."""
+        if not self.required <= input_data.keys():
+            missing = [key for key in self.required_order if key not in input_data]
+            raise ValueError(f"❌ Contract Violation! Missing required inputs: {missing}")
+
+    def render(self, input_data):
+        # 1. Validate Inputs (Contract Check)
+        self.check(input_data)
+
+        # 2. Build Structure (The "Context Builder" Pattern)
+        active_sections = {}
+        for section in self.sections:
+            if section.is_list:
+                source_list = input_data.get(section.source) or []
+                if not source_list and section.omit_if_empty:
+                    continue # Skip empty list
+                render = section.template.render
+                active_sections[section.key] = "[" + ",".join([render(item=item) for item in source_list]) + "]"
+            else:
+                active_sections[section.key] = section.template.render(**input_data)
+
+        # 3. Render Master Template
+        return self.template.render(active_sections=active_sections, **input_data)
+
+    def build(self, input_data):
+        """
+        Structured mode: returns the payload as Python objects. Fragments
+        (each list item on its own) are built as objects by their
+        ObjectTemplate, the master template only renders a small skeleton
+        with placeholders where the sections go. No section is rendered to
+        JSON text and parsed back.
+        """
+        self.check(input_data)
+
+        sections = {}
+        placeholders = {}
+        for section in self.sections:
+            if section.is_list:
+                source_list = input_data.get(section.source) or []
+                if not source_list and section.omit_if_empty:
+                    continue
+                build = section.build
+                sections[section.key] = [build(item=item) for item in source_list]
+            else:
+                sections[section.key] = section.build(**input_data)
+            placeholders[section.key] = json.dumps(_SECTION_SENTINEL + section.key)
+
+        skeleton = self.template.render(active_sections=placeholders, **input_data)
+        try:
+            return _fill_sections(json.loads(skeleton), sections)
+        except json.JSONDecodeError as e:
+            raise ValueError(
+                f"❌ Command '{self.name}' does not render valid JSON in structured mode "
+                f"(sections must be placed as whole JSON values): {e}"
+            ) from None
+
+
 @library
 class ContextBuilder:
     """
@@ -13,6 +452,10 @@ class ContextBuilder:
 
     def __init__(self):
         self.registry_cache = {}
+        # Registry index shared with other processes through .cache/registry
+        self.registry_index = RegistryIndex(os.getcwd()).load()
+        # Compiled commands per registry: registry_key -> {command: CommandPlan}
+        self.command_plans = {}
         # Setup Jinja2 to load from resources/templates
         template_dir = os.path.join(os.getcwd(), 'resources', 'templates')
         self.env = Environment(
@@ -22,14 +465,23 @@ class ContextBuilder:
 
     @keyword
     def load_registry(self, product, component, version):
-        """Loads the YAML registry for a specific component version."""
-        file_path = os.path.join(
-            os.getcwd(), 'resources', 'registry', product, component, f"{version}.yaml"
-        )
-        with open(file_path, 'r') as f:
-            self.registry_cache[f"{product}.{component}"] = yaml.safe_load(f)
+        """
+        Loads the YAML registry for a specific component version and compiles
+        its commands. Schema errors are raised here, with file and line.
+        """
+        registry_key = f"{product}.{component}"
+        with timed('robot_registry_load_seconds'):
+            registry = self.registry_index.get(product, component, version)
+            path = self.registry_index.path(product, component, version)
+            self.command_plans[registry_key] = self._compile(registry, path)
+        self.registry_cache[registry_key] = registry
         print(f"✅ Loaded Registry: {product}.{component} ({version})")
 
+    @keyword
+    def get_registry_versions(self, product, component):
+        """Returns the available registry versions of a component, oldest first."""
+        return self.registry_index.versions(product, component)
+
     @keyword
     def build_payload(self, product, component, command, input_data):
         """
@@ -38,85 +490,124 @@ class ContextBuilder:
         2. Input Data (Test Data)
         3. Jinja2 Templates
         """
-        registry = self.registry_cache.get(f"{product}.{component}")
-        if not registry:
+        with timed('robot_payload_render_seconds', mode='text'):
+            return self._get_plan(product, component, command).render(input_data)
+
+    @keyword
+    def build_payloads(self, product, component, command, input_data_list):
+        """
+        Convenience variant of `Build Payload` for a list of input_data dicts:
+        the compiled command is looked up once, then every payload is
+        rendered like `Build Payload` does. Costs the same per payload.
+        """
+        render = self._get_plan(product, component, command).render
+        with timed('robot_payload_render_seconds', mode='bulk'):
+            return [render(input_data) for input_data in input_data_list]
+
+    @keyword
+    def build_payload_object(self, product, component, command, input_data):
+        """
+        Structured variant of `Build Payload`: returns the payload as a
+        dictionary instead of JSON text, so callers need no `json.loads`.
+        """
+        with timed('robot_payload_render_seconds', mode='object'):
+            return self._get_plan(product, component, command).build(input_data)
+
+    @keyword
+    def build_payload_json(self, product, component, command, input_data):
+        """Structured build, serialized once to compact JSON (orjson when installed)."""
+        with timed('robot_payload_render_seconds', mode='json'):
+            data = dump_json(self._get_plan(product, component, command).build(input_data))
+        # The payload objects are already released here, only the bytes remain
+        return data.decode('utf-8')
+
+    @keyword
+    def write_payload(self, product, component, command, input_data, path):
+        """Structured build streamed straight to `path`, for multi-MB payloads. Returns the path."""
+        with timed('robot_payload_render_seconds', mode='file'):
+            payload = self._get_plan(product, component, command).build(input_data)
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, 'wb') as f:
+                write_json(payload, f)
+        return path
+
+    def _get_plan(self, product, component, command):
+        plans = self.command_plans.get(f"{product}.{component}")
+        if plans is None:
             raise ValueError(f"Registry not loaded for {product}.{component}")
 
-        cmd_def = registry['commands'].get(command)
-        if not cmd_def:
+        plan = plans.get(command)
+        if not plan:
             raise ValueError(f"Command '{command}' not found in registry.")
+        return plan
 
-        # 1. Validate Inputs (Contract Check)
-        self._validate_inputs(cmd_def.get('inputs', {}), input_data)
+    def _compile(self, registry, path):
+        """Validates the registry and compiles every command into a CommandPlan."""
+        def fail(message, *keys):
+            line = locate(path, keys)
+            where = f"{path}:{line}" if line else path
+            raise RegistrySchemaError(f"❌ Invalid registry {where}: {message}")
 
-        # 2. Build Structure (The "Context Builder" Pattern)
-        active_sections = self._process_structure(cmd_def.get('structure', {}), input_data, registry)
+        def template(name, *keys):
+            if not isinstance(name, str):
+                fail(f"expected a template file name, got {name!r}", *keys)
+            try:
+                return self.env.get_template(name)
+            except TemplateError as e:
+                fail(f"template '{name}' could not be loaded ({type(e).__name__}: {e})", *keys)
 
-        # 3. Render Master Template
-        template_name = cmd_def['template']
-        template = self.env.get_template(template_name)
-        
-        # Inject the pre-processed sections into the template
-        final_json = template.render(
-            active_sections=active_sections, 
-            **input_data # Pass raw data too for simple fields
-        )
-        
-        return final_json
+        if not isinstance(registry, dict) or not isinstance(registry.get('commands'), dict):
+            fail("'commands' must be a mapping", 'commands')
+        component_map = registry.get('components') or {}
+        if not isinstance(component_map, dict):
+            fail("'components' must be a mapping", 'components')
 
-    def _validate_inputs(self, rules, data):
-        """Enforces the 'Input Contract'."""
-        required = rules.get('required', [])
-        missing = [key for key in required if key not in data]
-        if missing:
-            raise ValueError(f"❌ Contract Violation! Missing required inputs: {missing}")
+        plans = {}
+        for name, cmd_def in registry['commands'].items():
+            at = ('commands', name)
+            if not isinstance(cmd_def, dict):
+                fail(f"command '{name}' must be a mapping", *at)
+            if 'template' not in cmd_def:
+                fail(f"command '{name}' has no 'template'", *at)
 
-    def _process_structure(self, structure_map, data, registry):
-        """
-        Iterates over the structure map to decide what to include.
-        Handles: optionality, lists, and recursive fragments.
-        """
-        active_sections = {}
-        component_map = registry.get('components', {})
-
-        for section_name, rules in structure_map.items():
-            json_key = rules['key']
-            
-            # CHECK 1: Is this a List?
-            if rules.get('type') == 'list':
-                source_list = data.get(rules['source'], [])
-                if not source_list and rules.get('omit_if_empty', True):
-                    continue # Skip empty list
-                
-                # Render list items
-                item_template_ref = rules['item_template']
-                item_template_file = component_map.get(item_template_ref)
-                
-                rendered_items = []
-                for item_data in source_list:
-                    t = self.env.get_template(item_template_file)
-                    rendered_items.append(t.render(item=item_data))
-                
-                # Jinja will receive this as a list of strings (JSON objects)
-                # We join them here or handle in template. Let's return the list.
-                # Actually, better to return the list object so Jinja can loop cleanly.
-                active_sections[json_key] = "[" + ",".join(rendered_items) + "]"
-                continue
+            inputs = cmd_def.get('inputs') or {}
+            if not isinstance(inputs, dict):
+                fail(f"'inputs' of '{name}' must be a mapping", *at, 'inputs')
+            required = inputs.get('required', [])
+            if not isinstance(required, list):
+                fail(f"'inputs.required' of '{name}' must be a list", *at, 'inputs', 'required')
+
+            sections = []
+            structure = cmd_def.get('structure') or {}
+            if not isinstance(structure, dict):
+                fail(f"'structure' of '{name}' must be a mapping", *at, 'structure')
+            for section_name, rules in structure.items():
+                section_at = (*at, 'structure', section_name)
+                if not isinstance(rules, dict) or 'key' not in rules:
+                    fail(f"section '{section_name}' needs a 'key'", *section_at)
+
+                # CHECK 1: Is this a List?
+                if rules.get('type') == 'list':
+                    for field in ('source', 'item_template'):
+                        if field not in rules:
+                            fail(f"list section '{section_name}' needs '{field}'", *section_at)
+                    ref = rules['item_template']
+                    if ref not in component_map:
+                        fail(f"unknown component '{ref}'", *section_at, 'item_template')
+                    sections.append(SectionPlan(
+                        rules['key'], True, rules['source'], rules.get('omit_if_empty', True),
+                        template(component_map[ref], 'components', ref),
+                    ))
+                    continue
+
+                # CHECK 2: Standard Fragment Render (sections without a template are ignored)
+                ref = rules.get('template_ref')
+                if ref:
+                    if ref not in component_map:
+                        fail(f"unknown component '{ref}'", *section_at, 'template_ref')
+                    sections.append(SectionPlan(
+                        rules['key'], False, None, False, template(component_map[ref], 'components', ref)
+                    ))
 
-            # CHECK 2: Is this Optional?
-            if not rules.get('required', True):
-                # Heuristic: If none of the input data relevant to this block exists, skip it?
-                # Simpler: If the specific input variable is None/Missing.
-                # For now, let's assume if it's in the structure, we try to render it 
-                # unless explicitly toggled off in input data? 
-                # (Refinement needed based on your specific logic preferences)
-                pass 
-
-            # CHECK 3: Standard Fragment Render
-            template_ref = rules.get('template_ref') # e.g., "Standard_Contact"
-            if template_ref:
-                template_file = component_map.get(template_ref)
-                t = self.env.get_template(template_file)
-                active_sections[json_key] = t.render(**data)
-        
-        return active_sections
\ No newline at end of file
+            plans[name] = CommandPlan(name, required, template(cmd_def['template'], *at, 'template'), sections)
+        return plans
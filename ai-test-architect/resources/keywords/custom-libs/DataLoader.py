@@ -1,12 +1,226 @@
 import os
 import yaml
 import copy
+import hashlib
+import random
+import time
+from collections import deque
+from yaml.composer import Composer
+from yaml.constructor import SafeConstructor
+from yaml.resolver import Resolver
 from robot.api import SuiteVisitor
+from robot.model import TagPatterns
+from robot.running import Keyword
+from robot.utils import MultiMatcher, escape
+
+from _cache import load_pickle, save_pickle
+from _metrics import record, timed
+from _schema import locate
+
+# Prefer the libyaml-backed loader, it parses several times faster
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+_CONTAINER_START = (yaml.MappingStartEvent, yaml.SequenceStartEvent)
+_CONTAINER_END = (yaml.MappingEndEvent, yaml.SequenceEndEvent)
+
+_TEST_KEYS = ('TestRunSettings', 'TestScenarios')
+_SCENARIO_KEYS = ('ScenarioVars', 'RunSettings')
+# Part of the compiled data's cache key; bump when compile_testdata's output changes
+_COMPILED_FORMAT = 2
+
+
+class ScenarioSchemaError(ValueError):
+    """Test data does not match the scenario schema; the message names file and line."""
+
+
+def _scenario_tags(run_settings):
+    tags = run_settings.get('Tags') or ()
+    return tuple(str(tag) for tag in tags) if isinstance(tags, (list, tuple)) else (str(tags),)
+
+
+def _kind(value):
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, (int, float)):
+        return 'number'
+    if isinstance(value, str):
+        return 'string'
+    if isinstance(value, list):
+        return 'list'
+    if isinstance(value, dict):
+        return 'mapping'
+    return type(value).__name__
+
+
+def compile_testdata(data, path):
+    """
+    Validates test data against the scenario schema and stores every test's
+    scenarios column-wise: {'TestRunSettings': {...}, 'names': [iteration
+    name per scenario], 'tags': [RunSettings Tags per scenario], 'vars':
+    [variable names], 'columns': [[value per scenario] per variable]}. Values keep their YAML types; a variable that
+    is missing or null in a scenario is None there and is not set.
+    Raises ScenarioSchemaError naming file and line of the first problem.
+    """
+    def fail(message, *keys):
+        line = locate(path, keys)
+        where = f"{path}:{line}" if line else path
+        raise ScenarioSchemaError(f"❌ Invalid test data {where}: {message}")
+
+    if not isinstance(data, dict):
+        fail("expected a mapping of test names")
+    compiled = {}
+    for test, config in data.items():
+        if not isinstance(config, dict):
+            fail(f"test '{test}' must be a mapping", test)
+        unknown = set(config) - set(_TEST_KEYS)
+        if unknown:
+            fail(f"unknown key(s) {sorted(unknown)}, expected {list(_TEST_KEYS)}", test, sorted(unknown)[0])
+        settings = config.get('TestRunSettings') or {}
+        if not isinstance(settings, dict):
+            fail("'TestRunSettings' must be a mapping", test, 'TestRunSettings')
+        scenarios = config.get('TestScenarios') or []
+        if not isinstance(scenarios, list):
+            fail("'TestScenarios' must be a list", test, 'TestScenarios')
+
+        names = []
+        tags = []
+        seen = {}  # iteration name -> scenario index
+        columns = {}  # variable -> values, in order of first appearance
+        kinds = {}  # variable -> (kind, index of the scenario that set it)
+        for index, scenario in enumerate(scenarios):
+            at = (test, 'TestScenarios', index)
+            if not isinstance(scenario, dict):
+                fail("a scenario must be a mapping", *at)
+            unknown = set(scenario) - set(_SCENARIO_KEYS)
+            if unknown:
+                fail(f"unknown key(s) {sorted(unknown)}, expected {list(_SCENARIO_KEYS)}", *at)
+            variables = scenario.get('ScenarioVars') or {}
+            run_settings = scenario.get('RunSettings') or {}
+            if not isinstance(variables, dict):
+                fail("'ScenarioVars' must be a mapping", *at, 'ScenarioVars')
+            if not isinstance(run_settings, dict):
+                fail("'RunSettings' must be a mapping", *at, 'RunSettings')
+
+            name = run_settings.get('IterationName', f"iter_{index + 1}")
+            if not isinstance(name, (str, int, float)) or isinstance(name, bool):
+                fail(f"'IterationName' must be a string, got {_kind(name)}", *at, 'RunSettings', 'IterationName')
+            name = str(name)
+            if name in seen:
+                fail(f"duplicate IterationName '{name}' (scenario {seen[name] + 1})", *at, 'RunSettings')
+            seen[name] = index
+            names.append(name)
+            scenario_tags = run_settings.get('Tags') or ()
+            if isinstance(scenario_tags, str):
+                scenario_tags = (scenario_tags,)
+            if not isinstance(scenario_tags, (list, tuple)) or not all(isinstance(t, str) for t in scenario_tags):
+                fail("'Tags' must be a string or a list of strings", *at, 'RunSettings', 'Tags')
+            tags.append(tuple(scenario_tags))
+
+            for key, value in variables.items():
+                if not isinstance(key, str) or not key:
+                    fail(f"variable name must be a non-empty string, got {key!r}", *at, 'ScenarioVars')
+                if value is None:
+                    continue
+                kind = _kind(value)
+                first = kinds.setdefault(key, (kind, index))
+                if first[0] != kind:
+                    fail(
+                        f"'{key}' is a {kind} here but a {first[0]} in scenario {first[1] + 1}",
+                        *at, 'ScenarioVars', key,
+                    )
+                if key not in columns:
+                    columns[key] = [None] * index
+                columns[key].append(value)
+            for key, column in columns.items():
+                if len(column) == index:
+                    column.append(None)
+
+        compiled[test] = {
+            'TestRunSettings': settings,
+            'names': names,
+            'tags': tags,
+            'vars': list(columns),
+            'columns': list(columns.values()),
+        }
+    return compiled
+
+
+class _EventLoader(Composer, SafeConstructor, Resolver):
+    """Constructs Python data from a pre-recorded list of YAML events."""
+
+    def __init__(self, events):
+        self._events = deque(events)
+        Composer.__init__(self)
+        SafeConstructor.__init__(self)
+        Resolver.__init__(self)
+
+    def check_event(self, *choices):
+        if not self._events:
+            return False
+        return not choices or isinstance(self._events[0], choices)
+
+    def peek_event(self):
+        return self._events[0]
+
+    def get_event(self):
+        return self._events.popleft()
+
 
 class DataLoader(SuiteVisitor):
-    def __init__(self, env_name="UAT"):
+    """
+    Pre-run modifier expanding template tests with scenarios from
+    resources/config/testdata/<env>/<suite path>.yaml.
+
+    Matrix mode: with several comma separated environments
+    (DataLoader.py:UAT,SIT,PROD) every env's testdata is loaded once and each
+    template test expands to env x scenario tests named
+    "<test> - <env> - <iteration>", tagged env:<env> and with ${ENV} set.
+    Scenario data equal across environments is shared, not duplicated.
+
+    Options (robot --prerunmodifier DataLoader.py:UAT:cache=False:lazy=True).
+    Robot splits the arguments at ':', so when a value contains one (such as
+    the env:<env> tags) separate them with ';' instead:
+    DataLoader.py;UAT,SIT;include=env:SIT
+    - cache: keep parsed test data in .cache/testdata, keyed by path+mtime+size.
+    - lazy:  only materialize top-level keys matching the suite's test names.
+    - expansion: 'copy' deep copies the template per scenario, 'shared' reuses
+      the template's body items and only creates the Set Test Variable steps.
+    - compiled: validate the test data against the scenario schema when it is
+      loaded (see compile_testdata) and keep it column-wise in the cache.
+      Variables are set with their YAML types instead of as strings.
+
+    Scenario selection, applied before anything is copied (patterns are
+    comma separated and match like Robot's --test / --include):
+    - select: IterationName patterns, e.g. select=smoke_*,iter_1
+    - include / exclude: tag patterns against RunSettings Tags, e.g. include=fastANDapi.
+      Scenario tags are also added to the expanded tests.
+    - sample: run a random sample of K scenarios per test; with stratify=<ScenarioVar>
+      every value of that variable gets its proportional share (at least one, if
+      there are no more values than K).
+      seed makes the sample repeatable; the seed used is printed either way.
+    """
+
+    def __init__(self, env_name="UAT", cache=True, lazy=False, expansion="copy", compiled=False,
+                 select=None, include=None, exclude=None, sample=0, stratify=None, seed=None):
+        if expansion not in ('copy', 'shared'):
+            raise ValueError(f"Unknown expansion mode '{expansion}', expected 'copy' or 'shared'.")
         self.env_name = env_name
+        self.envs = [env.strip() for env in env_name.split(',') if env.strip()]
         self.root_dir = os.getcwd()
+        self.cache = cache
+        self.lazy = lazy
+        self.expansion = expansion
+        self.compiled = compiled
+        self.select = MultiMatcher(select.split(','), ignore='_') if select else None
+        self.include = TagPatterns(include.split(',')) if include else None
+        self.exclude = TagPatterns(exclude.split(',')) if exclude else None
+        self.sample = int(sample)
+        self.stratify = stratify
+        self.seed = int(seed) if seed is not None else random.randrange(2**32)
+        self.cache_dir = os.path.join(self.root_dir, '.cache', 'testdata')
 
     def start_suite(self, suite):
         # FIX: Handle PosixPath (Robot 7.0+) vs String
@@ -22,51 +236,317 @@ class DataLoader(SuiteVisitor):
             rel_path = os.path.relpath(abs_source, testcases_dir)
             
             yaml_rel_path = os.path.splitext(rel_path)[0] + '.yaml'
+        except ValueError as e:
+            print(f"⚠️ Path Error: {e}")
+            return
+
+        # 2. LOAD EVERY ENVIRONMENT'S DATA ONCE
+        data_by_env = {}
+        for env in self.envs:
             yaml_path = os.path.join(
                 self.root_dir, 
                 'resources', 'config', 'testdata', 
-                self.env_name, 
+                env, 
                 yaml_rel_path
             )
-        except ValueError as e:
-            print(f"⚠️ Path Error: {e}")
-            return
+            try:
+                stat = os.stat(yaml_path)
+            except FileNotFoundError:
+                print(f"ℹ️ YAML Not Found: {yaml_path}")
+                continue
 
-        # 2. DEBUGGING
-        if not os.path.exists(yaml_path):
-            print(f"ℹ️ YAML Not Found: {yaml_path}")
-            return
-
-        print(f"✅ Loaded Data: {yaml_path}")
-        with open(yaml_path, 'r') as f:
-            data = yaml.safe_load(f) or {}
+            try:
+                data_by_env[env] = self._load_data(yaml_path, stat, [test.name for test in suite.tests])
+            except ScenarioSchemaError as e:
+                # Fail the suite's tests with the schema error instead of running them unexpanded
+                print(e)
+                for test in suite.tests:
+                    test.setup.config(name='BuiltIn.Fail', args=(escape(str(e)),))
+                return
 
         # 3. EXPAND TESTS
+        matrix = len(self.envs) > 1
         for test in list(suite.tests):
-            if test.name in data:
-                self._expand_test_case(suite, test, data[test.name])
+            configs = [(env, data[test.name]) for env, data in data_by_env.items() if test.name in data]
+            if not configs:
+                continue
+            if matrix:
+                self._expand_matrix(suite, test, self._share_equal(configs))
+            else:
+                self._expand_test_case(suite, test, configs[0][1])
+
+    def _load_data(self, yaml_path, stat, test_names):
+        """
+        Returns the parsed test data, from the on-disk cache when it is
+        still valid. In lazy mode only `test_names` are guaranteed to be present.
+        """
+        start = time.perf_counter()
+        wanted = set(test_names) if self.lazy else None
+        entry = self._read_cache(yaml_path, stat) if self.cache else None
+        if entry and (entry['keys'] is None or (wanted is not None and wanted <= entry['keys'])):
+            print(f"✅ Loaded Data (cache): {yaml_path}")
+            record('robot_yaml_load_seconds', time.perf_counter() - start, source='cache')
+            return entry['data']
+
+        with open(yaml_path, 'r') as f:
+            if wanted is None:
+                data, keys = self._prepare(yaml.load(f, Loader=SafeLoader) or {}, yaml_path), None
+            else:
+                data, keys = (entry['data'], entry['keys']) if entry else ({}, set())
+                data = {**data, **self._prepare(self._load_selected(f, wanted - keys), yaml_path)}
+                keys = keys | wanted
+        print(f"✅ Loaded Data: {yaml_path}")
+
+        if self.cache:
+            self._write_cache(yaml_path, stat, data, keys)
+        record('robot_yaml_load_seconds', time.perf_counter() - start, source='full' if wanted is None else 'lazy')
+        return data
+
+    def _prepare(self, data, yaml_path):
+        return compile_testdata(data, yaml_path) if self.compiled else data
+
+    def _load_selected(self, stream, wanted):
+        """
+        Streams the YAML event-by-event and only builds objects for the
+        top-level keys in `wanted`; every other subtree is skipped unparsed.
+        """
+        events = yaml.parse(stream, Loader=SafeLoader)
+        for event in events:
+            if isinstance(event, yaml.MappingStartEvent):
+                break
+        else:
+            return {}
+
+        selected = {}
+        for key_event in events:
+            if isinstance(key_event, yaml.MappingEndEvent):
+                break
+            keep = isinstance(key_event, yaml.ScalarEvent) and key_event.value in wanted
+            value_events = self._take_subtree(events, keep)
+            if keep:
+                try:
+                    selected[key_event.value] = _EventLoader([
+                        yaml.StreamStartEvent(), yaml.DocumentStartEvent(),
+                        *value_events,
+                        yaml.DocumentEndEvent(), yaml.StreamEndEvent(),
+                    ]).get_single_data()
+                except yaml.composer.ComposerError:
+                    # Alias to an anchor outside the selected keys: parse it all
+                    stream.seek(0)
+                    data = yaml.load(stream, Loader=SafeLoader) or {}
+                    return {key: data[key] for key in wanted if key in data}
+        return selected
+
+    def _take_subtree(self, events, keep):
+        depth = 0
+        taken = []
+        for event in events:
+            if keep:
+                taken.append(event)
+            if isinstance(event, _CONTAINER_START):
+                depth += 1
+            elif isinstance(event, _CONTAINER_END):
+                depth -= 1
+            if depth == 0:
+                return taken
+        return taken
+
+    def _cache_path(self, yaml_path):
+        # Compiled data has its own entry, the raw one stays valid for the other modes
+        key = f"{yaml_path}:compiled:{_COMPILED_FORMAT}" if self.compiled else yaml_path
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.pickle")
+
+    def _read_cache(self, yaml_path, stat):
+        entry = load_pickle(self._cache_path(yaml_path))
+        if not isinstance(entry, dict):
+            return None
+        if entry.get('mtime') != stat.st_mtime_ns or entry.get('size') != stat.st_size:
+            return None
+        return entry
+
+    def _write_cache(self, yaml_path, stat, data, keys):
+        entry = {'mtime': stat.st_mtime_ns, 'size': stat.st_size, 'data': data, 'keys': keys}
+        save_pickle(self._cache_path(yaml_path), entry)
 
     def _expand_test_case(self, suite, template_test, test_config):
         suite.tests.remove(template_test)
-        scenarios = test_config.get('TestScenarios', [])
-        
-        for index, scenario in enumerate(scenarios):
-            vars = scenario.get('ScenarioVars', {})
-            settings = scenario.get('RunSettings', {})
-            
-            new_test = copy.deepcopy(template_test)
-            iter_name = settings.get('IterationName', f"iter_{index+1}")
-            new_test.name = f"{template_test.name} - {iter_name}"
-            
-            for key, value in vars.items():
-                if value is not None:
+        self._expand_config(suite, template_test, test_config)
+
+    def _expand_matrix(self, suite, template_test, configs):
+        """One test per (env, scenario); configs are (env, test config) pairs."""
+        suite.tests.remove(template_test)
+        for env, test_config in configs:
+            self._expand_config(suite, template_test, test_config, env)
+
+    def _share_equal(self, configs):
+        """
+        Replaces data equal to the first environment's with the first
+        environment's objects: whole tests, else compiled columns or
+        free-form scenarios. Equal values then exist once in memory, also
+        in the expanded tests' arguments.
+        """
+        base = configs[0][1]
+        shared = [configs[0]]
+        for env, config in configs[1:]:
+            if config == base:
+                config = base
+            elif self.compiled:
+                base_columns = dict(zip(base['vars'], base['columns']))
+                config = {
+                    **config,
+                    'names': base['names'] if config['names'] == base['names'] else config['names'],
+                    'tags': base['tags'] if config['tags'] == base['tags'] else config['tags'],
+                    'columns': [
+                        base_columns[key] if base_columns.get(key) == column else column
+                        for key, column in zip(config['vars'], config['columns'])
+                    ],
+                }
+            else:
+                base_scenarios = base.get('TestScenarios', [])
+                scenarios = config.get('TestScenarios', [])
+                config = {
+                    **config,
+                    'TestScenarios': [
+                        base_scenarios[i] if i < len(base_scenarios) and base_scenarios[i] == scenario else scenario
+                        for i, scenario in enumerate(scenarios)
+                    ],
+                }
+            shared.append((env, config))
+        return shared
+
+    def _expand_config(self, suite, template_test, test_config, env=None):
+        if self.compiled:
+            names, tags = test_config['names'], test_config['tags']
+            keys, columns = test_config['vars'], test_config['columns']
+
+            def variables(selected):
+                # Column-wise: gather the selected rows of every column, then zip them
+                if len(selected) < len(names):
+                    picked = [[column[i] for i in selected] for column in columns]
+                else:
+                    picked = columns
+                rows = zip(*picked) if keys else [()] * len(selected)
+                return ([(key, value) for key, value in zip(keys, row) if value is not None] for row in rows)
+
+            def value(index, key):
+                return columns[keys.index(key)][index] if key in keys else None
+        else:
+            scenarios = test_config.get('TestScenarios', [])
+            names = [
+                scenario.get('RunSettings', {}).get('IterationName', f"iter_{index+1}")
+                for index, scenario in enumerate(scenarios)
+            ]
+            tags = [_scenario_tags(scenario.get('RunSettings', {})) for scenario in scenarios]
+
+            def variables(selected):
+                for index in selected:
+                    vars = scenarios[index].get('ScenarioVars', {})
+                    yield [(key, str(value)) for key, value in vars.items() if value is not None]
+
+            def value(index, key):
+                return scenarios[index].get('ScenarioVars', {}).get(key)
+
+        if env is not None:
+            # Selectable with include/exclude like any scenario tag
+            tags = [(*scenario_tags, f"env:{env}") for scenario_tags in tags]
+        selected = self._select(template_test.name, names, tags, value, env)
+        if env is None:
+            tests = ((names[i], tags[i], vars) for i, vars in zip(selected, variables(selected)))
+        else:
+            tests = (
+                (f"{env} - {names[i]}", tags[i], [('ENV', env), *vars])
+                for i, vars in zip(selected, variables(selected))
+            )
+        with timed('robot_scenario_expansion_seconds', mode=self.expansion):
+            self._expand(suite, template_test, tests)
+
+    def _select(self, test_name, names, tags, value, env=None):
+        """Indices of the scenarios to expand, in file order."""
+        selected = range(len(names))
+        if self.select:
+            selected = [i for i in selected if self.select.match(str(names[i]))]
+        if self.include:
+            selected = [i for i in selected if self.include.match(tags[i])]
+        if self.exclude:
+            selected = [i for i in selected if not self.exclude.match(tags[i])]
+        note = ""
+        if self.sample and self.sample < len(selected):
+            rng = random.Random(f"{self.seed}:{test_name}")
+            if self.stratify:
+                selected = self._stratified(rng, selected, lambda i: value(i, self.stratify))
+            else:
+                selected = sorted(rng.sample(list(selected), self.sample))
+            note = f", sampled with seed={self.seed}"
+        if len(selected) < len(names):
+            where = f" [{env}]" if env else ""
+            print(f"🔎 '{test_name}'{where}: {len(selected)} of {len(names)} scenarios selected{note}")
+        return selected
+
+    def _stratified(self, rng, indices, stratum):
+        """
+        Sample of exactly self.sample indices with every stratum represented
+        in proportion to its size (largest remainder). Each stratum gets at
+        least one while there are no more strata than the sample size;
+        otherwise the strata with the smallest remainders get none.
+        """
+        groups = {}
+        for index in indices:
+            groups.setdefault(repr(stratum(index)), []).append(index)
+        total = len(indices)
+        quotas = {key: self.sample * len(group) / total for key, group in groups.items()}
+        minimum = 1 if len(groups) <= self.sample else 0
+        shares = {key: max(minimum, int(quota)) for key, quota in quotas.items()}
+        # The minimum of one may overshoot: take back from the most over-represented
+        while sum(shares.values()) > self.sample:
+            key = max((key for key in shares if shares[key] > minimum), key=lambda key: shares[key] - quotas[key])
+            shares[key] -= 1
+        # Hand out what rounding left over to the groups that lost most to it
+        for key in sorted(groups, key=lambda key: shares[key] - quotas[key]):
+            if sum(shares.values()) >= self.sample:
+                break
+            if shares[key] < len(groups[key]):
+                shares[key] += 1
+        picked = []
+        for key, group in groups.items():
+            picked.extend(rng.sample(group, min(shares[key], len(group))))
+        return sorted(picked)
+
+    def _expand(self, suite, template_test, scenarios):
+        """scenarios: (iteration name, tags, [(variable, value), ...]) per test to create."""
+        for iter_name, tags, vars in scenarios:
+            name = f"{template_test.name} - {iter_name}"
+
+            if self.expansion == 'shared':
+                new_test = self._share_test(template_test, name, vars)
+            else:
+                # Memo the parent suite, otherwise deepcopy walks (and copies)
+                # the whole suite including every test expanded so far
+                new_test = copy.deepcopy(template_test, {id(suite): suite})
+                new_test.name = name
+                for key, value in vars:
                     self._inject_variable(new_test, key, value)
+            if tags:
+                new_test.tags.add(tags)
             
             suite.tests.append(new_test)
 
+    def _share_test(self, template_test, name, vars):
+        """
+        Shallow test copy whose body reuses the template's (immutable) steps.
+        Only the leading Set Test Variable keywords are new objects.
+        """
+        new_test = template_test.copy(name=name, tags=list(template_test.tags))
+        setters = [
+            Keyword(name="BuiltIn.Set Test Variable", args=(f"${{{key}}}", value))
+            for key, value in vars
+        ]
+        new_test.body = setters + list(template_test.body)
+        return new_test
+
     def _inject_variable(self, test, name, value):
         kw = test.body.create_keyword(name="BuiltIn.Set Test Variable")
-        kw.args = (f"${{{name}}}", str(value))
+        kw.args = (f"${{{name}}}", value)
         
         if len(test.body) > 0:
             last_item = test.body.pop() 
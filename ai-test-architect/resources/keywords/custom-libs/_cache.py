@@ -0,0 +1,31 @@
+"""
+On-disk caches shared by the custom libraries (and the backend's impact state).
+"""
+import os
+import pickle
+
+
+def load_pickle(path):
+    """
+    Unpickled contents of `path`, or None when the file is missing or cannot
+    be loaded, e.g. because an older version of the code wrote it.
+    """
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except Exception:
+        return None
+
+
+def save_pickle(path, obj):
+    write_atomic(path, pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def write_atomic(path, data):
+    """Writes `data` (bytes) to `path`, creating its directory."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Parallel workers may race on the same file: write-then-rename is atomic
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
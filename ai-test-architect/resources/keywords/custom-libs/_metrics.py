@@ -0,0 +1,58 @@
+"""
+Timing hooks shared by the custom libraries.
+
+When the backend runs robot with ROBOT_METRICS_FILE set, timings are
+buffered and appended to that file as JSON lines at exit (or every
+FLUSH_EVERY records); the backend folds them into its /metrics histograms.
+Without the variable every hook is a no-op. Warm pool workers, which run
+many suites in one process, switch the file per run with configure().
+"""
+import atexit
+import json
+import os
+import time
+from contextlib import contextmanager
+
+METRICS_FILE = os.getenv('ROBOT_METRICS_FILE')
+FLUSH_EVERY = 1000
+
+_buffer = []
+
+
+def record(metric, seconds, **labels):
+    if not METRICS_FILE:
+        return
+    _buffer.append({'metric': metric, 'seconds': seconds, 'labels': labels})
+    if len(_buffer) >= FLUSH_EVERY:
+        flush()
+
+
+@contextmanager
+def timed(metric, **labels):
+    if not METRICS_FILE:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(metric, time.perf_counter() - start, **labels)
+
+
+def configure(path):
+    """Writes pending timings to the current file, then records to `path` (None = off)."""
+    global METRICS_FILE
+    flush()
+    METRICS_FILE = path
+
+
+def flush():
+    if not _buffer:
+        return
+    lines = ''.join(json.dumps(entry) + '\n' for entry in _buffer)
+    _buffer.clear()
+    with open(METRICS_FILE, 'a') as f:
+        f.write(lines)
+
+
+atexit.register(flush)
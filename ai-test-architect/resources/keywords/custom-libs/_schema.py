@@ -0,0 +1,35 @@
+"""
+Helpers shared by the custom libraries' schema validation.
+"""
+import yaml
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+
+def locate(path, keys):
+    """
+    Line (1-based) of the deepest node of `keys` found in the YAML file, for
+    error messages. String keys index mappings, integers index sequences.
+    """
+    try:
+        with open(path, 'r') as f:
+            node = yaml.compose(f, Loader=SafeLoader)
+    except (OSError, yaml.YAMLError):
+        return None
+    line = node.start_mark.line + 1 if node else None
+    for key in keys:
+        if isinstance(node, yaml.MappingNode):
+            match = next((v for k, v in node.value if k.value == key), None)
+        elif isinstance(node, yaml.SequenceNode) and isinstance(key, int) and key < len(node.value):
+            match = node.value[key]
+        else:
+            break
+        if match is None:
+            break
+        # Point at the key itself for scalars, at the block start for mappings
+        node = match
+        line = node.start_mark.line + 1
+    return line